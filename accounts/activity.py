@@ -0,0 +1,99 @@
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import connections, transaction
+from ticsol.cache import user_stats_cache
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """
+    Write-behind buffer for ``last_login``.
+
+    Logins record their timestamp in memory, keeping the latest one per
+    user, and the pending values are written in one ``bulk_update`` at
+    most ``LAST_LOGIN_FLUSH_INTERVAL`` seconds after the first of them,
+    or as soon as ``LAST_LOGIN_BUFFER_SIZE`` users are pending. Whatever
+    is left is flushed when the process exits. An interval of 0 writes
+    every login straight through.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+        self._registered = False
+
+    @property
+    def interval(self):
+        return getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 60)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'LAST_LOGIN_BUFFER_SIZE', 1000)
+
+    def record(self, user_id, when):
+        if self.interval <= 0:
+            self.write({user_id: when})
+            return
+
+        with self._lock:
+            current = self._pending.get(user_id)
+            if current is None or current < when:
+                self._pending[user_id] = when
+            full = len(self._pending) >= self.max_size
+            if not self._registered:
+                atexit.register(self.flush)
+                self._registered = True
+            if self._timer is None and not full:
+                self._timer = threading.Timer(
+                    self.interval, self.flush_in_background
+                )
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+        try:
+            self.write(pending)
+        except Exception:
+            logger.exception('Failed to flush %d last_login updates',
+                             len(pending))
+            with self._lock:
+                for user_id, when in pending.items():
+                    current = self._pending.get(user_id)
+                    if current is None or current < when:
+                        self._pending[user_id] = when
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def write(self, pending):
+        User.objects.bulk_update(
+            [
+                User(pk=user_id, last_login=when)
+                for user_id, when in sorted(pending.items())
+            ],
+            ['last_login'],
+            batch_size=500
+        )
+        # ``bulk_update`` sends no signals, so invalidate the user stats
+        # that read ``last_login`` here.
+        transaction.on_commit(user_stats_cache.bump)
+
+
+last_login_buffer = LastLoginBuffer()
@@ -1,12 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from ticsol.admin import LargeTableAdminMixin
 from .models import User
 
 
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(LargeTableAdminMixin, UserAdmin):
     model = User
     list_display = ('email', 'role', 'is_staff', 'is_superuser', 'is_active')
-    list_filter = ('email', 'role', 'is_active', 'is_staff')
+    list_filter = ('role', 'is_active', 'is_staff')
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         ('Permissions', {'fields': ('is_staff', 'is_active', 'is_superuser')}),
@@ -29,5 +30,20 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('email',)
     ordering = ('email',)
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match a prefix of the email, which is stored lower-cased so that
+        the ``user_email_prefix_idx`` index serves it, or a user id. Also
+        backs the ticket assignee autocomplete.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        return queryset.filter(
+            email__startswith=User.objects.normalize_email(term)
+        ), False
+
 
 admin.site.register(User, CustomUserAdmin)
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from ticsol.cache import cache_is_shared
+from .models import User
+from .tokens import USER_STATE_CLAIMS, STATE_AT_CLAIM
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ``ttl``."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return ``(found, value)`` for ``key``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+revocations = TTLCache(
+    maxsize=getattr(settings, 'AUTH_STATE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_STATE_CACHE_TTL', 30),
+)
+
+
+def revocation_key(user_id):
+    return f'auth:revoked:{user_id}'
+
+
+def revoke_user_state(user_id):
+    """
+    Mark every token claim snapshot of ``user_id`` taken before now as
+    stale. Other processes notice within ``AUTH_STATE_CACHE_TTL`` seconds.
+
+    Refreshing re-reads the user, so only access tokens minted before now
+    carry the old claims, and the mark only has to outlive them.
+    """
+    lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+    cache.set(revocation_key(user_id), time.time(), int(lifetime))
+    revocations.delete(user_id)
+
+
+def get_revoked_at(user_id):
+    found, revoked_at = revocations.get(user_id)
+    if not found:
+        revoked_at = cache.get(revocation_key(user_id))
+        revocations.set(user_id, revoked_at)
+    return revoked_at
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds ``request.user`` from token claims.
+
+    The user row is only loaded for tokens issued without state claims or
+    whose claims predate a revocation published by ``revoke_user_state``.
+    Revocations only reach other workers through a shared cache, so
+    without one every request loads the row.
+    """
+
+    def get_user(self, validated_token):
+        claims = USER_STATE_CLAIMS + (
+            STATE_AT_CLAIM, api_settings.USER_ID_CLAIM
+        )
+        if not cache_is_shared() or any(
+            claim not in validated_token for claim in claims
+        ):
+            return super().get_user(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        revoked_at = get_revoked_at(user_id)
+        if (
+            revoked_at is not None and
+            validated_token[STATE_AT_CLAIM] <= revoked_at
+        ):
+            return super().get_user(validated_token)
+
+        if (
+            api_settings.CHECK_USER_IS_ACTIVE and
+            not validated_token['is_active']
+        ):
+            raise AuthenticationFailed(
+                'User is inactive', code='user_inactive'
+            )
+
+        return self.build_user(validated_token)
+
+    def build_user(self, validated_token):
+        """
+        Return a ``User`` whose claim-backed fields are loaded and whose
+        other fields are deferred, so ``save()`` only writes loaded fields.
+        """
+        values = {
+            claim: validated_token[claim] for claim in USER_STATE_CLAIMS
+        }
+        values[api_settings.USER_ID_FIELD] = (
+            validated_token[api_settings.USER_ID_CLAIM]
+        )
+        field_names = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in values
+        ]
+        return User.from_db(
+            router.db_for_read(User),
+            field_names,
+            [values[name] for name in field_names],
+        )
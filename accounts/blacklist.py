@@ -0,0 +1,147 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from ticsol.cache import cache_is_shared
+
+GENERATION_KEY = 'auth:blacklist:generation'
+
+# Rows are re-read with this much overlap so that a blacklist entry whose
+# transaction committed after a later one was loaded is not missed.
+LOAD_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class BlacklistFilter:
+    """
+    In-memory pre-filter for blacklisted refresh token ``jti`` values.
+
+    A miss means the token is definitely not blacklisted and the database
+    lookup can be skipped; a hit still has to be confirmed against the
+    table. The filter is rebuilt from the table periodically and picks up
+    rows blacklisted by other processes whenever the shared generation
+    counter moves, or at least every ``TOKEN_BLACKLIST_FILTER_MAX_AGE``
+    seconds. Without a shared cache the counter is per process, so every
+    token is checked against the table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._generation = None
+        self._loaded_at = None
+        self._synced_at = 0
+        self._built_at = 0
+
+    @property
+    def max_age(self):
+        return getattr(settings, 'TOKEN_BLACKLIST_FILTER_MAX_AGE', 30)
+
+    @property
+    def rebuild_interval(self):
+        return getattr(settings, 'TOKEN_BLACKLIST_FILTER_REBUILD', 3600)
+
+    def might_contain(self, jti):
+        if not cache_is_shared():
+            return True
+        self.sync()
+        return jti in self._bloom
+
+    def add(self, jti):
+        """Record a token this process has just blacklisted."""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 1, None)
+
+    def sync(self):
+        generation = cache.get(GENERATION_KEY)
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._bloom is None or
+                self._bloom.count > self._bloom.capacity or
+                now - self._built_at > self.rebuild_interval
+            ):
+                self._rebuild(generation, now)
+            elif (
+                generation != self._generation or
+                now - self._synced_at > self.max_age
+            ):
+                self._load_recent(generation, now)
+
+    def _rebuild(self, generation, now):
+        loaded_at = timezone.now()
+        jtis = list(
+            BlacklistedToken.objects.values_list('token__jti', flat=True)
+        )
+        bloom = BloomFilter(
+            max(len(jtis) * 2, getattr(
+                settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 10000
+            ))
+        )
+        for jti in jtis:
+            bloom.add(jti)
+
+        self._bloom = bloom
+        self._generation = generation
+        self._loaded_at = loaded_at
+        self._synced_at = self._built_at = now
+
+    def _load_recent(self, generation, now):
+        loaded_at = timezone.now()
+        jtis = BlacklistedToken.objects.filter(
+            blacklisted_at__gte=self._loaded_at - LOAD_OVERLAP
+        ).values_list('token__jti', flat=True)
+        for jti in jtis:
+            self._bloom.add(jti)
+
+        self._generation = generation
+        self._loaded_at = loaded_at
+        self._synced_at = now
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+
+
+blacklist_filter = BlacklistFilter()
@@ -0,0 +1,22 @@
+from django_filters import rest_framework as filters
+from .models import User, USER_CHOICES
+
+
+class UserFilter(filters.FilterSet):
+    """
+    Filters for the admin user list. ``email`` matches a prefix of the
+    address, which is stored lower-cased, so the ``user_email_prefix_idx``
+    index can serve it on PostgreSQL.
+    """
+    role = filters.ChoiceFilter(choices=USER_CHOICES)
+    date_joined = filters.IsoDateTimeFromToRangeFilter()
+    email = filters.CharFilter(method='filter_email_prefix')
+
+    class Meta:
+        model = User
+        fields = ['is_active', 'role', 'date_joined', 'email']
+
+    def filter_email_prefix(self, queryset, name, value):
+        return queryset.filter(
+            email__startswith=User.objects.normalize_email(value)
+        )
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many login attempts in progress, try again shortly.'
+    default_code = 'hashing_unavailable'
+
+
+def check_password_hash(password, encoded):
+    """
+    Return ``(valid, upgraded)``. ``upgraded`` is a freshly encoded hash
+    when the stored one uses outdated hasher parameters, else ``None``.
+    """
+    valid, must_update = verify_password(password, encoded)
+    if valid and must_update:
+        return True, make_password(password)
+    return valid, None
+
+
+class HashingPool:
+    """
+    Bounded worker pool for password hashing.
+
+    PBKDF2 releases the GIL, so hashes run in parallel on the workers
+    while at most ``LOGIN_HASH_WORKERS + LOGIN_HASH_QUEUE`` logins are in
+    flight. Further logins are refused with a 503 instead of queueing
+    behind a burst of slow hashes and tying up every request thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = getattr(settings, 'LOGIN_HASH_WORKERS', 4)
+                queue = getattr(settings, 'LOGIN_HASH_QUEUE', 16)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='login-hash'
+                )
+                self._slots = threading.BoundedSemaphore(workers + queue)
+            return self._executor
+
+    def run(self, func, *args):
+        executor = self.get_executor()
+        if not self._slots.acquire(blocking=False):
+            raise HashingUnavailable()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(
+                timeout=getattr(settings, 'LOGIN_HASH_TIMEOUT', 10)
+            )
+        except TimeoutError:
+            future.cancel()
+            raise HashingUnavailable()
+
+    def check_password(self, password, encoded):
+        return self.run(check_password_hash, password, encoded)
+
+    def hash_password(self, password):
+        return self.run(make_password, password)
+
+
+hashing_pool = HashingPool()
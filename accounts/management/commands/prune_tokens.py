@@ -0,0 +1,72 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken, OutstandingToken
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired outstanding and blacklisted tokens in small '
+        'batches. Each batch commits on its own, so the command can be '
+        'interrupted and re-run at any point.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of outstanding tokens deleted per transaction.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches.',
+        )
+        parser.add_argument(
+            '--after-id',
+            type=int,
+            default=0,
+            help='Resume after this outstanding token id.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = options['after_id']
+        cutoff = timezone.now()
+        deleted_outstanding = deleted_blacklisted = 0
+
+        while True:
+            ids = list(
+                OutstandingToken.objects.filter(
+                    id__gt=last_id, expires_at__lte=cutoff
+                ).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            with transaction.atomic():
+                deleted, _ = BlacklistedToken.objects.filter(
+                    token_id__in=ids
+                ).delete()
+                deleted_blacklisted += deleted
+                deleted, _ = OutstandingToken.objects.filter(
+                    id__in=ids
+                ).delete()
+                deleted_outstanding += deleted
+
+            last_id = ids[-1]
+            self.stdout.write(
+                f'Deleted {len(ids)} expired tokens up to id {last_id}.'
+            )
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted_outstanding} outstanding and '
+            f'{deleted_blacklisted} blacklisted tokens.'
+        ))
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', False)), fields=['-date_joined', '-id'], name='user_list_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
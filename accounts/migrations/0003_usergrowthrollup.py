@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:11
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    UserGrowthRollup = apps.get_model('accounts', 'UserGrowthRollup')
+    db_alias = schema_editor.connection.alias
+
+    days = User.objects.using(db_alias).order_by().annotate(
+        rollup_day=TruncDate('date_joined')
+    ).values('rollup_day').annotate(total=Count('id'))
+    UserGrowthRollup.objects.using(db_alias).bulk_create(
+        UserGrowthRollup(day=row['rollup_day'], count=row['total']) for row in days
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserGrowthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
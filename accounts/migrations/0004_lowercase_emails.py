@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:40
+
+from django.db import migrations
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    """
+    Store every email lower-cased. An address that only differs by case
+    from another account's is left as it is, since the two accounts cannot
+    be merged here.
+    """
+    User = apps.get_model('accounts', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    mixed_case = users.exclude(email=Lower('email')).values_list(
+        'id', 'email'
+    )
+    for user_id, email in mixed_case:
+        email = email.lower()
+        if not users.filter(email=email).exists():
+            users.filter(pk=user_id).update(email=email)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usergrowthrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from ticsol.rollups import DailyRollup
 from django.contrib.auth.models import BaseUserManager, AbstractUser
 
 USER_CHOICES = [
@@ -8,6 +9,17 @@ USER_CHOICES = [
 
 
 class CustomUserManager(BaseUserManager):
+    @classmethod
+    def normalize_email(cls, email):
+        """
+        Lower-case the whole address. Logins, uniqueness checks and the
+        prefix searches all compare lower-cased emails.
+        """
+        return super().normalize_email(email).strip().lower()
+
+    def get_by_natural_key(self, username):
+        return super().get_by_natural_key(self.normalize_email(username))
+
     def create_user(self, email, password=None):
         if not email:
             raise ValueError('Email is required')
@@ -45,5 +57,27 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination of the admin user list, which never shows
+            # staff accounts.
+            models.Index(
+                fields=['-date_joined', '-id'],
+                name='user_list_joined_idx',
+                condition=models.Q(is_staff=False)
+            ),
+            # ``LIKE 'prefix%'`` email search; the unique index cannot
+            # serve it under a non-C collation.
+            models.Index(
+                fields=['email'],
+                name='user_email_prefix_idx',
+                opclasses=['varchar_pattern_ops']
+            ),
+        ]
+
     def __str__(self):
         return self.email
+
+
+class UserGrowthRollup(DailyRollup):
+    """Accounts created per day, by ``date_joined``."""
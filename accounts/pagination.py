@@ -0,0 +1,7 @@
+from ticsol.pagination import KeysetPagination
+
+
+class UserCursorPagination(KeysetPagination):
+    ordering_field = 'date_joined'
+    page_size = 20
+    max_page_size = 100
@@ -1,8 +1,15 @@
+import time
 from .models import User
 from rest_framework import serializers
-from django.contrib.auth import authenticate
 from .validators import validate_password
+from django.contrib.auth.signals import user_login_failed
 from django.core.validators import validate_email
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import UserStateRefreshToken
+from .hashing import hashing_pool
+from ticsol.middleware import PhaseTimer
 
 
 class UserListSerializer(serializers.ModelSerializer):
@@ -39,31 +46,48 @@ class LoginUserSerializer(serializers.Serializer):
             )
 
         email = email.lower().strip()
+        timer = self.context.get('timer') or PhaseTimer()
+
+        # One lookup serves the suspension check, the password check and
+        # the token claims; ``authenticate()`` would load the user again.
+        state_at = time.time()
+        with timer.phase('lookup'):
+            user = User.objects.filter(email=email).first()
+        if user is None:
+            # Hash anyway, so that unknown emails take as long to reject
+            # as wrong passwords.
+            with timer.phase('hash'):
+                hashing_pool.hash_password(password)
+            self.login_failed(email)
+            raise serializers.ValidationError("Invalid email or password.")
 
-        try:
-            user = User.objects.get(email=email)
-
-            if not user.is_active:
-                raise serializers.ValidationError(
-                    "Account has been suspended."
-                )
-
-            authenticated_user = authenticate(
-                request=self.context.get('request'),
-                email=email,
-                password=password
+        if not user.is_active:
+            self.login_failed(email)
+            raise serializers.ValidationError(
+                "Account has been suspended."
             )
 
-            if not authenticated_user:
-                raise serializers.ValidationError(
-                    "Incorrect password. Please try again."
-                )
+        with timer.phase('hash'):
+            valid, upgraded_password = hashing_pool.check_password(
+                password, user.password
+            )
+        if not valid:
+            self.login_failed(email)
+            raise serializers.ValidationError(
+                "Incorrect password. Please try again."
+            )
 
-            attrs['user'] = authenticated_user
-            return attrs
+        attrs['user'] = user
+        attrs['upgraded_password'] = upgraded_password
+        attrs['state_at'] = state_at
+        return attrs
 
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Invalid email or password.")
+    def login_failed(self, email):
+        """Send ``user_login_failed`` as ``authenticate()`` would."""
+        user_login_failed.send(
+            sender=__name__, credentials={'email': email},
+            request=self.context.get('request')
+        )
 
 
 class CreateUserSerializer(serializers.ModelSerializer):
@@ -121,3 +145,44 @@ class CreateUserSerializer(serializers.ModelSerializer):
         return User.objects.create_user(
             email=validated_data['email'], password=password
         )
+
+
+class UserStateTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer using the Bloom-filtered blacklist checks.
+
+    simplejwt copies the old refresh payload into the new tokens, so the
+    user is re-read and its current state stamped on both of them;
+    otherwise a role change or suspension would be undone once its
+    revocation mark expires.
+    """
+
+    token_class = UserStateRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        state_at = time.time()
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).first() if user_id else None
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages['no_active_account'],
+                'no_active_account',
+            )
+        refresh.stamp_user_state(user, state_at)
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
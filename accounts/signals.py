@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ticsol.cache import user_stats_cache
+from .authentication import revoke_user_state
+from .models import User, UserGrowthRollup
+from .tokens import USER_STATE_CLAIMS
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_stats(sender, using, **kwargs):
+    transaction.on_commit(user_stats_cache.bump, using=using)
+
+
+@receiver(post_save, sender=User)
+def update_growth_rollup_on_save(sender, instance, created, **kwargs):
+    if created:
+        UserGrowthRollup.add(instance.date_joined, 1)
+
+
+@receiver(post_delete, sender=User)
+def update_growth_rollup_on_delete(sender, instance, **kwargs):
+    UserGrowthRollup.add(instance.date_joined, -1)
+
+
+@receiver(post_save, sender=User)
+def revoke_token_state(sender, instance, created, update_fields, using,
+                       **kwargs):
+    """Outdate token claims when a field they snapshot may have changed."""
+    if created:
+        return
+    if update_fields is not None and not (
+        set(update_fields) & set(USER_STATE_CLAIMS)
+    ):
+        return
+    transaction.on_commit(
+        lambda: revoke_user_state(instance.pk), using=using
+    )
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_state(sender, instance, using, **kwargs):
+    """Outdate every token claim of a deleted user."""
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_user_state(user_id), using=using)
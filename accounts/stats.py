@@ -0,0 +1,54 @@
+from .models import User, UserGrowthRollup
+
+USER_COUNT_FILTERS = {
+    'total': {},
+    'active': {'is_active': True},
+    'inactive': {'is_active': False},
+    'admin': {'role': 'admin'},
+    'user': {'role': 'user'},
+}
+
+
+def count_users(name):
+    return User.objects.filter(**USER_COUNT_FILTERS[name]).count()
+
+
+def get_user_counts():
+    return {name: count_users(name) for name in USER_COUNT_FILTERS}
+
+
+def user_growth_by_month(year):
+    return UserGrowthRollup.by_month(year)
+
+
+def user_growth_series(series_range):
+    return UserGrowthRollup.series(*series_range)
+
+
+def rebuild_user_growth_rollup():
+    return UserGrowthRollup.rebuild('date_joined', User.objects.all())
+
+
+def recent_active_user_count(since):
+    return User.objects.filter(last_login__gte=since).count()
+
+
+def build_user_dashboard(counts, growth_by_month, recent_active_users,
+                         growth_series=None):
+    active_users = counts['active']
+    user_activity_score = int(
+        (recent_active_users / active_users) * 100
+    ) if active_users > 0 else 0
+
+    dashboard = {
+        'totalUsers': counts['total'],
+        'activeUsers': active_users,
+        'inactiveUsers': counts['inactive'],
+        'adminUsers': counts['admin'],
+        'regularUsers': counts['user'],
+        'userGrowthByMonth': growth_by_month,
+        'userActivityScore': user_activity_score
+    }
+    if growth_series is not None:
+        dashboard['userGrowthSeries'] = growth_series
+    return dashboard
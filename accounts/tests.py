@@ -1,3 +1,466 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from django.apps import apps
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher, identify_hasher, make_password
+)
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken, OutstandingToken
+)
+from rest_framework_simplejwt.tokens import AccessToken
+from .activity import LastLoginBuffer
+from .authentication import revocations, revoke_user_state
+from .blacklist import GENERATION_KEY, BloomFilter, blacklist_filter
+from .hashing import HashingPool, hashing_pool
+from .models import User
+from .tokens import UserStateRefreshToken
 
-# Create your tests here.
+
+class UserListViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        password = make_password('Passw0rd!')
+        User.objects.bulk_create(
+            User(
+                email=f'user{i}@example.com',
+                password=password,
+                role='admin' if i % 5 == 0 else 'user',
+                is_active=i % 3 != 0,
+                date_joined=now - timedelta(days=i),
+            )
+            for i in range(30)
+        )
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def emails(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [user['email'] for user in response.data['results']]
+
+    def test_pages_follow_cursor_without_loading_passwords(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/auth/users/?page_size=12')
+        self.assertNotIn('password', context.captured_queries[-1]['sql'])
+
+        seen = [user['email'] for user in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [user['email'] for user in response.data['results']]
+        self.assertEqual(seen, [f'user{i}@example.com' for i in range(30)])
+
+    def test_filters(self):
+        self.assertEqual(
+            self.emails('/auth/users/?email=USER1'),
+            ['user1@example.com'] + [
+                f'user{i}@example.com' for i in range(10, 20)
+            ]
+        )
+        self.assertEqual(
+            self.emails('/auth/users/?role=admin&is_active=true'),
+            ['user5@example.com', 'user10@example.com', 'user20@example.com',
+             'user25@example.com']
+        )
+        since = (timezone.now() - timedelta(days=2, hours=12)).isoformat()
+        self.assertEqual(
+            self.emails(f'/auth/users/?date_joined_after={since}'.replace(
+                '+', '%2B'
+            )),
+            ['user0@example.com', 'user1@example.com', 'user2@example.com']
+        )
+
+    def test_admin_changelist_search(self):
+        client = APIClient()
+        client.force_login(self.admin)
+        response = client.get('/admin/accounts/user/', {'q': 'USER1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {user.email for user in response.context['cl'].result_list},
+            {'user1@example.com'} | {
+                f'user1{i}@example.com' for i in range(10)
+            }
+        )
+        self.assertIsNone(response.context['cl'].full_result_count)
+
+    def test_emails_are_stored_lower_cased(self):
+        user = User.objects.create_user(' Agent.Smith@Example.COM', 'x')
+        self.assertEqual(user.email, 'agent.smith@example.com')
+        self.assertEqual(
+            User.objects.get_by_natural_key('AGENT.smith@example.com'), user
+        )
+        self.assertEqual(
+            self.emails('/auth/users/?email=Agent.S'), [user.email]
+        )
+        client = APIClient()
+        client.force_login(self.admin)
+        response = client.get('/admin/accounts/user/', {'q': 'AGENT.S'})
+        self.assertEqual(list(response.context['cl'].result_list), [user])
+
+    def test_migration_lowercases_existing_emails(self):
+        migration = import_module('accounts.migrations.0004_lowercase_emails')
+        User.objects.filter(email='user1@example.com').update(
+            email='User1@Example.com'
+        )
+        # Lower-casing this one would clash with user3@example.com.
+        User.objects.filter(email='user4@example.com').update(
+            email='User3@example.com'
+        )
+        migration.lowercase_emails(
+            apps, SimpleNamespace(connection=connection)
+        )
+        emails = set(User.objects.values_list('email', flat=True))
+        self.assertIn('user1@example.com', emails)
+        self.assertNotIn('User1@Example.com', emails)
+        self.assertIn('User3@example.com', emails)
+
+
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=0)
+class LoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'Passw0rd!')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, email, password):
+        return self.client.post(
+            '/auth/login/', {'email': email, 'password': password}
+        )
+
+    def test_login_reads_the_user_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.login('USER@example.com', 'Passw0rd!')
+        self.assertEqual(response.status_code, 200)
+        selects = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and
+            'accounts_user' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_phase_timings_follow_the_timing_policy(self):
+        User.objects.create_superuser('staff@example.com', 'Passw0rd!')
+        for password in ('Passw0rd!', 'wrong'):
+            response = self.login('user@example.com', password)
+            self.assertFalse(response.has_header('Server-Timing'))
+        response = self.login('staff@example.com', 'Passw0rd!')
+        for phase in ('lookup;', 'hash;', 'save;', 'token;'):
+            self.assertIn(phase, response['Server-Timing'])
+        with override_settings(SQL_INSTRUMENTATION_HEADER=False):
+            response = self.login('staff@example.com', 'Passw0rd!')
+            self.assertFalse(response.has_header('Server-Timing'))
+        with override_settings(DEBUG=True):
+            response = self.login('user@example.com', 'wrong')
+            self.assertIn('hash;', response['Server-Timing'])
+
+    def test_rejections(self):
+        for email, password, message in [
+            ('nobody@example.com', 'x', 'Invalid email or password.'),
+            ('user@example.com', 'wrong', 'Incorrect password.'),
+        ]:
+            response = self.login(email, password)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(
+                message, response.data['error']['non_field_errors'][0]
+            )
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.login('user@example.com', 'Passw0rd!')
+        self.assertEqual(
+            response.data['error']['non_field_errors'][0],
+            'Account has been suspended.'
+        )
+
+    def test_failures_are_signalled_and_hashed(self):
+        failures = []
+
+        def receiver(sender, credentials, request, **kwargs):
+            failures.append((credentials, request.path))
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        with mock.patch(
+            'accounts.serializers.hashing_pool', wraps=hashing_pool
+        ) as pool:
+            self.login('Nobody@example.com', 'x')
+            pool.hash_password.assert_called_once_with('x')
+            self.login('user@example.com', 'wrong')
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.login('user@example.com', 'Passw0rd!')
+        self.assertEqual(failures, [
+            ({'email': 'nobody@example.com'}, '/auth/login/'),
+            ({'email': 'user@example.com'}, '/auth/login/'),
+            ({'email': 'user@example.com'}, '/auth/login/'),
+        ])
+
+    def test_outdated_hash_is_upgraded(self):
+        hasher = PBKDF2PasswordHasher()
+        User.objects.filter(pk=self.user.pk).update(password=hasher.encode(
+            'Passw0rd!', hasher.salt(), iterations=1000
+        ))
+        response = self.login('user@example.com', 'Passw0rd!')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertFalse(
+            identify_hasher(self.user.password).must_update(
+                self.user.password
+            )
+        )
+        self.assertTrue(self.user.check_password('Passw0rd!'))
+
+    @override_settings(LOGIN_HASH_WORKERS=1, LOGIN_HASH_QUEUE=0)
+    def test_saturated_pool_returns_503(self):
+        pool = HashingPool()
+        started, release = threading.Event(), threading.Event()
+
+        def hold_worker():
+            started.set()
+            release.wait()
+
+        busy = threading.Thread(target=pool.run, args=(hold_worker,))
+        busy.start()
+        started.wait()
+        try:
+            with mock.patch('accounts.serializers.hashing_pool', pool):
+                response = self.login('user@example.com', 'Passw0rd!')
+        finally:
+            release.set()
+            busy.join()
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=3600, LAST_LOGIN_BUFFER_SIZE=3)
+class LastLoginBufferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        password = make_password('Passw0rd!')
+        cls.users = User.objects.bulk_create(
+            User(email=f'user{i}@example.com', password=password)
+            for i in range(3)
+        )
+
+    def last_logins(self):
+        return dict(User.objects.values_list('pk', 'last_login'))
+
+    def test_updates_are_coalesced_until_flush(self):
+        buffer = LastLoginBuffer()
+        self.addCleanup(buffer.flush)
+        now = timezone.now()
+        first, second = self.users[:2]
+        buffer.record(first.pk, now)
+        buffer.record(first.pk, now - timedelta(minutes=5))
+        buffer.record(second.pk, now)
+        self.assertEqual(set(self.last_logins().values()), {None})
+
+        with CaptureQueriesContext(connection) as context:
+            buffer.flush()
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(self.last_logins(), {
+            first.pk: now, second.pk: now, self.users[2].pk: None
+        })
+
+    def test_full_buffer_flushes(self):
+        buffer = LastLoginBuffer()
+        now = timezone.now()
+        for user in self.users:
+            buffer.record(user.pk, now)
+        self.assertEqual(set(self.last_logins().values()), {now})
+
+
+@override_settings(CACHE_SHARED=True)
+class TokenStateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+
+    def setUp(self):
+        cache.clear()
+        revocations.clear()
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/auth/token/refresh/', {'refresh': token})
+
+    def get(self, url, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.client.credentials()
+        user_reads = [
+            query for query in context.captured_queries
+            if 'FROM "accounts_user"' in query['sql']
+        ]
+        return response, user_reads
+
+    def test_claims_are_trusted_only_with_a_shared_cache(self):
+        access = UserStateRefreshToken.for_user(self.admin).access_token
+        response, user_reads = self.get('/auth/status/', access)
+        self.assertEqual(response.data['role'], 'admin')
+        self.assertEqual(user_reads, [])
+        with override_settings(CACHE_SHARED=False):
+            _, user_reads = self.get('/auth/status/', access)
+        self.assertEqual(len(user_reads), 1)
+
+    def test_refresh_stamps_current_state_after_demotion(self):
+        refresh = UserStateRefreshToken.for_user(self.admin)
+        self.admin.is_staff = False
+        self.admin.role = 'user'
+        self.admin.save()
+        # The revocation mark is gone, as after it expires.
+        cache.clear()
+        revocations.clear()
+
+        response = self.refresh(str(refresh))
+        self.assertEqual(response.status_code, 200)
+        for token in (
+            AccessToken(response.data['access']),
+            UserStateRefreshToken(response.data['refresh']),
+        ):
+            self.assertFalse(token['is_staff'])
+            self.assertEqual(token['role'], 'user')
+            self.assertGreater(token['state_at'], refresh['state_at'])
+        response, _ = self.get('/auth/users/', response.data['access'])
+        self.assertEqual(response.status_code, 403)
+
+    def test_refresh_refuses_deactivated_user(self):
+        refresh = UserStateRefreshToken.for_user(self.admin)
+        User.objects.filter(pk=self.admin.pk).update(is_active=False)
+        response = self.refresh(str(refresh))
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_is_refused(self):
+        access = UserStateRefreshToken.for_user(self.admin).access_token
+        response, _ = self.get('/auth/users/', access)
+        self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.delete()
+        for url in ('/auth/users/', '/tickets/'):
+            response, _ = self.get(url, access)
+            self.assertEqual(response.status_code, 401, url)
+
+    def test_suspension_during_login_outdates_its_tokens(self):
+        check_password = hashing_pool.check_password
+
+        def suspend_then_check(*args):
+            # Lands after the login read the user, before its token.
+            User.objects.filter(pk=self.admin.pk).update(is_active=False)
+            revoke_user_state(self.admin.pk)
+            return check_password(*args)
+
+        with mock.patch.object(
+            hashing_pool, 'check_password', side_effect=suspend_then_check
+        ):
+            response = self.client.post('/auth/login/', {
+                'email': 'staff@example.com', 'password': 'Passw0rd!'
+            })
+        self.assertEqual(response.status_code, 200)
+        access = response.data['access']
+        response, user_reads = self.get('/auth/users/', access)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(user_reads), 1)
+
+    def test_refresh_rotates_and_blacklists(self):
+        refresh = str(UserStateRefreshToken.for_user(self.admin))
+        response = self.refresh(refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+        self.assertEqual(
+            self.refresh(response.data['refresh']).status_code, 200
+        )
+
+
+class BlacklistFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'Passw0rd!')
+
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.reset()
+        self.addCleanup(blacklist_filter.reset)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        added = [f'jti-{i}' for i in range(1000)]
+        for jti in added:
+            bloom.add(jti)
+        self.assertTrue(all(jti in bloom for jti in added))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 50)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_other_workers_blacklisting_reaches_the_filter(self):
+        token = UserStateRefreshToken.for_user(self.user)
+        jti = token['jti']
+        self.assertFalse(blacklist_filter.might_contain(jti))
+
+        # Another worker blacklists the token and bumps the generation.
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=jti)
+        )
+        cache.set(GENERATION_KEY, (cache.get(GENERATION_KEY) or 0) + 1, None)
+        self.assertTrue(blacklist_filter.might_contain(jti))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_without_shared_cache_every_token_is_checked(self):
+        token = UserStateRefreshToken.for_user(self.user)
+        self.assertTrue(blacklist_filter.might_contain(token['jti']))
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.get(jti=token['jti'])
+        )
+        with self.assertRaises(TokenError):
+            UserStateRefreshToken(str(token))
+
+    def test_prune_tokens(self):
+        now = timezone.now()
+        tokens = [
+            OutstandingToken.objects.create(
+                user=self.user, jti=f'jti-{i}', token=f'token-{i}',
+                expires_at=now + timedelta(days=1 if i % 2 else -1)
+            )
+            for i in range(6)
+        ]
+        BlacklistedToken.objects.create(token=tokens[0])
+        BlacklistedToken.objects.create(token=tokens[1])
+
+        out = StringIO()
+        call_command('prune_tokens', batch_size=2, stdout=out)
+        self.assertIn(
+            'Deleted 3 outstanding and 1 blacklisted', out.getvalue()
+        )
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)),
+            {'jti-1', 'jti-3', 'jti-5'}
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
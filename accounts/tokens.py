@@ -0,0 +1,46 @@
+import time
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .blacklist import blacklist_filter
+
+# User fields copied into tokens so that authentication can rebuild the
+# user without loading its row.
+USER_STATE_CLAIMS = ('email', 'role', 'is_active', 'is_staff', 'is_superuser')
+STATE_AT_CLAIM = 'state_at'
+
+
+class UserStateRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's auth state as claims.
+
+    The claims are copied into every access token minted from it, along
+    with ``state_at``, the time the state was read from the database.
+    Blacklist checks go through an in-memory Bloom filter first and only
+    hit the database for tokens the filter cannot rule out.
+    """
+
+    @classmethod
+    def for_user(cls, user, state_at=None):
+        token = super().for_user(user)
+        token.stamp_user_state(user, state_at)
+        return token
+
+    def stamp_user_state(self, user, state_at=None):
+        """
+        Copy the user's auth state into the claims. ``state_at`` should be
+        taken before the user was read, so that a revocation landing
+        between the read and this call still outdates the claims.
+        """
+        for claim in USER_STATE_CLAIMS:
+            self[claim] = getattr(user, claim)
+        self[STATE_AT_CLAIM] = time.time() if state_at is None else state_at
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if blacklist_filter.might_contain(jti):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result
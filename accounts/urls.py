@@ -1,14 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from rest_framework_simplejwt.views import TokenRefreshView
 
+if settings.ASYNC_READ_VIEWS:
+    user_stats_view = views.AsyncUserStatsView
+else:
+    user_stats_view = views.UserStatsView
+
 urlpatterns = [
     path('register/', views.RegisterUserView.as_view(), name='register'),
     path('login/', views.LoginView.as_view(), name='login'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('status/', views.get_user_status, name='user-status'),
-    path('users/stats/', views.UserStatsView.as_view(), name='user-stats'),
+    path('users/stats/', user_stats_view.as_view(),
+         name='user-stats'),
     path('users/', views.UserListView.as_view(), name='user_list'),
     path(
         'users/<int:user_id>/status/',
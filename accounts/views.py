@@ -1,18 +1,32 @@
-from rest_framework import status
+from rest_framework import generics, status
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.views import APIView
 from .serializers import (
     LoginUserSerializer, CreateUserSerializer,
     UserStatusSerializer, UserListSerializer
 )
 from .models import User
+from .activity import last_login_buffer
+from .filters import UserFilter
+from .pagination import UserCursorPagination
 from django.utils import timezone
-from django.db.models import Count
-from django.db.models.functions import TruncMonth
 from datetime import datetime
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import UserStateRefreshToken
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
+from functools import partial
+from ticsol.cache import user_stats_cache
+from ticsol.concurrency import run_concurrently
+from ticsol.middleware import (
+    PhaseTimer, append_server_timing, may_send_timing
+)
+from ticsol.rollups import parse_series_range, series_cache_key
+from ticsol.views import AsyncAPIView, ReplicaReadMixin
+from .stats import (
+    USER_COUNT_FILTERS, count_users, get_user_counts, user_growth_by_month,
+    user_growth_series, recent_active_user_count, build_user_dashboard
+)
 
 
 class RegisterUserView(APIView):
@@ -43,17 +57,29 @@ class LoginView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
+        timer = PhaseTimer()
         serializer = LoginUserSerializer(
             data=request.data,
-            context={'request': request}
+            context={'request': request, 'timer': timer}
         )
         if serializer.is_valid():
             user = serializer.validated_data['user']
 
-            user.last_login = timezone.now()
-            user.save(update_fields=['last_login'])
-
-            refresh = RefreshToken.for_user(user)
+            with timer.phase('save'):
+                user.last_login = timezone.now()
+                last_login_buffer.record(user.pk, user.last_login)
+                # Rehashed with the current hasher parameters.
+                upgraded_password = serializer.validated_data[
+                    'upgraded_password'
+                ]
+                if upgraded_password:
+                    user.password = upgraded_password
+                    user.save(update_fields=['password'])
+
+            with timer.phase('token'):
+                refresh = UserStateRefreshToken.for_user(
+                    user, serializer.validated_data['state_at']
+                )
 
             response_data = {
                 'refresh': str(refresh),
@@ -62,18 +88,25 @@ class LoginView(APIView):
                 "role": user.role
             }
 
-            return Response(
+            response = Response(
                 response_data,
                 status=status.HTTP_200_OK
             )
-        return Response(
-            {
-                'status': 'error',
-                'message': 'Validation failed. Please check your input.',
-                'error': serializer.errors
-            },
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        else:
+            response = Response(
+                {
+                    'status': 'error',
+                    'message': 'Validation failed. Please check your input.',
+                    'error': serializer.errors
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Phase timings show how far a login got, so they follow the policy
+        # of the SQL timings.
+        user = serializer.validated_data.get('user', request.user)
+        if may_send_timing(user, response):
+            append_server_timing(response, *timer.metrics())
+        return response
 
 
 class LogoutView(APIView):
@@ -93,7 +126,7 @@ class LogoutView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            token = RefreshToken(refresh_token)
+            token = UserStateRefreshToken(refresh_token)
             token.blacklist()
 
             return Response(
@@ -127,60 +160,74 @@ def get_user_status(request):
     )
 
 
-class UserStatsView(APIView):
+class UserStatsView(ReplicaReadMixin, APIView):
     """
     API endpoint to provide user statistics for the admin dashboard
     """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        inactive_users = User.objects.filter(is_active=False).count()
-        admin_users = User.objects.filter(role='admin').count()
-        regular_users = User.objects.filter(role='user').count()
-
-        current_year = datetime.now().year
-        user_growth_by_month = [0] * 12
-
-        users_by_month = User.objects.filter(
-            date_joined__year=current_year
-        ).annotate(
-            month=TruncMonth('date_joined')
-        ).values('month').annotate(
-            count=Count('id')
-        ).order_by('month')
-
-        for entry in users_by_month:
-            month_idx = entry['month'].month - 1
-            user_growth_by_month[month_idx] = entry['count']
-
-        recent_active_users = User.objects.filter(
-            last_login__gte=datetime.now().replace(day=1)
-        ).count()
-        user_activity_score = int(
-            (recent_active_users / active_users) * 100
-        ) if active_users > 0 else 0
-
-        return Response({
-            'totalUsers': total_users,
-            'activeUsers': active_users,
-            'inactiveUsers': inactive_users,
-            'adminUsers': admin_users,
-            'regularUsers': regular_users,
-            'userGrowthByMonth': user_growth_by_month,
-            'userActivityScore': user_activity_score
-        })
-
-
-class UserListView(APIView):
+        now = datetime.now()
+        series_range = parse_series_range(request.query_params)
+        data = user_stats_cache.get_or_set(
+            series_cache_key(now.strftime('%Y-%m'), series_range),
+            lambda: self.get_stats(series_range)
+        )
+        return Response(data)
+
+    def get_stats(self, series_range=None):
+        now = datetime.now()
+        return build_user_dashboard(
+            get_user_counts(),
+            user_growth_by_month(now.year),
+            recent_active_user_count(now.replace(day=1)),
+            user_growth_series(series_range) if series_range else None
+        )
+
+
+class AsyncUserStatsView(ReplicaReadMixin, AsyncAPIView):
+    """Async ``UserStatsView``; every count runs concurrently."""
+    permission_classes = UserStatsView.permission_classes
+
+    async def get(self, request):
+        now = datetime.now()
+        series_range = parse_series_range(request.query_params)
+        data = await user_stats_cache.aget_or_set(
+            series_cache_key(now.strftime('%Y-%m'), series_range),
+            lambda: self.get_stats(series_range)
+        )
+        return Response(data)
+
+    async def get_stats(self, series_range=None):
+        now = datetime.now()
+        queries = [
+            *[partial(count_users, name) for name in USER_COUNT_FILTERS],
+            partial(user_growth_by_month, now.year),
+            partial(recent_active_user_count, now.replace(day=1))
+        ]
+        if series_range:
+            queries.append(partial(user_growth_series, series_range))
+        results = await run_concurrently(*queries)
+        counts = results[:len(USER_COUNT_FILTERS)]
+        return build_user_dashboard(
+            dict(zip(USER_COUNT_FILTERS, counts)),
+            *results[len(USER_COUNT_FILTERS):]
+        )
+
+
+class UserListView(ReplicaReadMixin, generics.ListAPIView):
     """API endpoint for listing all users."""
     permission_classes = [IsAdminUser]
-
-    def get(self, request):
-        users = User.objects.filter(is_staff=False).order_by('-date_joined')
-        serializer = UserListSerializer(users, many=True)
-        return Response(serializer.data)
+    serializer_class = UserListSerializer
+    pagination_class = UserCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = UserFilter
+
+    def get_queryset(self):
+        # Only load the listed columns, never the password hashes.
+        return User.objects.filter(is_staff=False).only(
+            *self.serializer_class.Meta.fields
+        )
 
 
 class UserStatusView(APIView):
@@ -1,8 +1,11 @@
 from django.contrib import admin
-from .models import Ticket
+from django.db.models import Q
+from ticsol.admin import LargeTableAdminMixin
+from .models import ArchivedTicket, Ticket
+from .search import matching_ticket_ids, search_tickets
 
 
-class TicketAdmin(admin.ModelAdmin):
+class TicketAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = (
         'title',
         'priority',
@@ -12,9 +15,62 @@ class TicketAdmin(admin.ModelAdmin):
         'created_at'
     )
     list_filter = ('priority', 'status')
-    search_fields = (
-        'title', 'description', 'created_user__username', 'assigned_to'
+    list_select_related = ('created_user',)
+    list_defer = ('description',)
+    raw_id_fields = ('created_user',)
+    autocomplete_fields = ('assignee',)
+    search_fields = ('title', 'assigned_to', '^created_user__email')
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Ticket ids and owner emails go through their indexes, anything
+        else through the full-text index when the database has one. Ids
+        are also searched as text, for tickets titled with error codes.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            ids = matching_ticket_ids(queryset, term)
+            if ids is None:
+                ids = super().get_search_results(
+                    request, queryset, search_term
+                )[0].values('pk')
+            return queryset.filter(Q(pk=int(term)) | Q(pk__in=ids)), False
+        if '@' in term:
+            return queryset.filter(
+                created_user__email__startswith=term.lower()
+            ), False
+
+        results = search_tickets(queryset, term)
+        if results is None:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return results, False
+
+
+class ArchivedTicketAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = (
+        'id',
+        'title',
+        'priority',
+        'created_user',
+        'assigned_to',
+        'created_at',
+        'archived_at'
     )
+    list_filter = ('priority',)
+    list_select_related = ('created_user',)
+    list_defer = ('description',)
+    search_fields = ('=id', '^created_user__email')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(Ticket, TicketAdmin)
+admin.site.register(ArchivedTicket, ArchivedTicketAdmin)
@@ -0,0 +1,169 @@
+import heapq
+from datetime import timedelta
+from itertools import islice
+from operator import attrgetter
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from .models import ArchivedTicket, Ticket
+from .signals import tickets_archived
+
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def include_archived(request):
+    """Whether the request opts into archived tickets."""
+    value = request.query_params.get('include_archived', '')
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'TICKET_ARCHIVE_AFTER_DAYS', 90)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_tickets(cutoff):
+    """
+    Tickets resolved before ``cutoff``. Resolved tickets cannot be edited,
+    so their last update is when they were resolved.
+    """
+    return Ticket.objects.filter(status='resolved', updated_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move up to ``batch_size`` tickets resolved before ``cutoff`` to the
+    archive table in one transaction. Returns the number moved.
+    """
+    using = router.db_for_write(Ticket)
+    with transaction.atomic(using=using):
+        tickets = list(
+            archivable_tickets(cutoff).using(using).select_for_update()
+            .order_by('id').values(*ArchivedTicket.COPIED_FIELDS)
+            [:batch_size]
+        )
+        if not tickets:
+            return 0
+
+        now = timezone.now()
+        ArchivedTicket.objects.using(using).bulk_create(
+            ArchivedTicket(**ticket, archived_at=now) for ticket in tickets
+        )
+        delete_rows([ticket['id'] for ticket in tickets], using)
+        tickets_archived.send(sender=Ticket, tickets=tickets, using=using)
+    return len(tickets)
+
+
+def delete_rows(ids, using):
+    """
+    Delete the tickets with ``ids`` in one statement. The tickets are moved
+    rather than deleted, so the delete signals and their counter updates
+    must not run; ``tickets_archived`` takes their place.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(Ticket._meta.db_table)
+    column = connection.ops.quote_name(Ticket._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {column} IN ({placeholders})', ids
+        )
+
+
+def archive_resolved_tickets(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive every ticket resolved before ``cutoff``, yielding the size of
+    each batch. Batches commit one by one, so an interrupted run keeps
+    what it moved and the next run resumes with the remaining tickets.
+    """
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return
+        yield moved
+
+
+class MergedRows:
+    """
+    The rows of several querysets read as one set ordered by ``ordering``,
+    for the list paginators and the export.
+
+    Each queryset is read in its own index order and the results merged,
+    so a page costs a bounded read of each table rather than a sort of
+    their union. Only filtering, ordering, counting, slicing and iterating
+    are supported, and every ordering field must sort the same way.
+    """
+    ordered = True
+
+    def __init__(self, querysets, ordering, window=None):
+        self.querysets = list(querysets)
+        self.ordering = tuple(ordering)
+        self.window = window
+        self._result = None
+
+    @property
+    def db(self):
+        return self.querysets[0].db
+
+    def using(self, alias):
+        return MergedRows(
+            [queryset.using(alias) for queryset in self.querysets],
+            self.ordering, self.window
+        )
+
+    def filter(self, *args, **kwargs):
+        return MergedRows(
+            [queryset.filter(*args, **kwargs) for queryset in self.querysets],
+            self.ordering
+        )
+
+    def order_by(self, *ordering):
+        return MergedRows(self.querysets, ordering)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None or (
+            self.window is not None
+        ):
+            raise TypeError('MergedRows only supports one plain slice.')
+        return MergedRows(
+            self.querysets, self.ordering, (key.start or 0, key.stop)
+        )
+
+    def merge(self, iterables):
+        descending = {name.startswith('-') for name in self.ordering}
+        if len(descending) != 1:
+            raise ValueError('Ordering fields must all sort the same way.')
+        key = attrgetter(*(name.lstrip('-') for name in self.ordering))
+        return heapq.merge(*iterables, key=key, reverse=descending.pop())
+
+    def ordered_querysets(self):
+        return [
+            queryset.order_by(*self.ordering) for queryset in self.querysets
+        ]
+
+    def iterator(self, chunk_size=None):
+        return self.merge(
+            queryset.iterator(chunk_size=chunk_size)
+            for queryset in self.ordered_querysets()
+        )
+
+    def __iter__(self):
+        if self._result is None:
+            start, stop = self.window or (0, None)
+            querysets = self.ordered_querysets()
+            if stop is not None:
+                # No table contributes more than the first ``stop`` rows.
+                querysets = [queryset[:stop] for queryset in querysets]
+            self._result = list(
+                islice(self.merge(querysets), start, stop)
+            )
+        return iter(self._result)
+
+    def __len__(self):
+        # ``list()`` asks for the length first, so this must not call it.
+        iter(self)
+        return len(self._result)
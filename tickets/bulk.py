@@ -0,0 +1,116 @@
+from django.db import router, transaction
+from django.utils import timezone
+from .models import Ticket, PRIORITY_RANKS
+from .permissions import filter_editable, filter_visible
+from .signals import tickets_bulk_updated
+
+BULK_MAX_TICKETS = 500
+
+RESOLVED_MESSAGE = 'Resolved tickets cannot be edited.'
+
+STATE_FIELDS = Ticket.TRACKED_FIELDS + ('created_user_id', 'assigned_to')
+
+
+def apply_bulk_action(user, ids, action, assigned_to=None, priority=None,
+                      assignee=None):
+    """
+    Assign, re-prioritise or resolve the tickets in ``ids`` on behalf of
+    ``user`` with set-based updates and return one outcome per requested id.
+
+    The rules of the single-ticket path still hold: tickets the user cannot
+    see are not found, resolved tickets are left untouched, and assigning
+    an open ticket moves it to in-progress.
+    """
+    ids = list(dict.fromkeys(ids))
+    outcomes = {}
+    using = router.db_for_write(Ticket)
+
+    with transaction.atomic(using=using):
+        rows = {
+            row['id']: row
+            for row in filter_visible(
+                Ticket.objects.select_for_update(), user
+            ).filter(id__in=ids).values('id', *STATE_FIELDS)
+        }
+
+        eligible = []
+        for ticket_id in ids:
+            row = rows.get(ticket_id)
+            if row is None:
+                outcomes[ticket_id] = {
+                    'id': ticket_id,
+                    'outcome': 'not_found',
+                    'detail': 'Ticket not found.',
+                }
+            elif row['status'] == 'resolved':
+                outcomes[ticket_id] = {
+                    'id': ticket_id,
+                    'outcome': 'skipped',
+                    'detail': RESOLVED_MESSAGE,
+                }
+            else:
+                eligible.append(row)
+
+        changes = []
+        for before, after in _apply(
+            user, eligible, action, assigned_to, priority, assignee
+        ):
+            changes.append((before, after))
+            outcomes[before['id']] = {
+                'id': before['id'],
+                'outcome': 'updated',
+                'status': after['status'],
+                'priority': after['priority'],
+                'assigned_to': after['assigned_to'],
+            }
+
+        if changes:
+            tickets_bulk_updated.send(
+                sender=Ticket, changes=changes, using=using
+            )
+
+    results = [outcomes[ticket_id] for ticket_id in ids]
+    return {
+        'updated': sum(r['outcome'] == 'updated' for r in results),
+        'skipped': sum(r['outcome'] == 'skipped' for r in results),
+        'not_found': sum(r['outcome'] == 'not_found' for r in results),
+        'results': results,
+    }
+
+
+def _apply(user, rows, action, assigned_to, priority, assignee):
+    now = timezone.now()
+    editable = filter_editable(Ticket.objects.all(), user)
+
+    if action == 'assign':
+        opened = [row['id'] for row in rows if row['status'] == 'open']
+        others = [row['id'] for row in rows if row['status'] != 'open']
+        if opened:
+            editable.filter(id__in=opened).update(
+                assigned_to=assigned_to, assignee=assignee,
+                status='in-progress', updated_at=now
+            )
+        if others:
+            editable.filter(id__in=others).update(
+                assigned_to=assigned_to, assignee=assignee, updated_at=now
+            )
+        new_values = {'assigned_to': assigned_to}
+    elif action == 'prioritize':
+        editable.filter(id__in=[row['id'] for row in rows]).update(
+            priority=priority, queue_rank=PRIORITY_RANKS[priority],
+            updated_at=now
+        )
+        new_values = {'priority': priority}
+    elif action == 'resolve':
+        editable.filter(id__in=[row['id'] for row in rows]).update(
+            status='resolved', queue_rank=None, updated_at=now
+        )
+        new_values = {'status': 'resolved'}
+    else:
+        raise ValueError(f'Unknown bulk action: {action}')
+
+    for row in rows:
+        after = {**row, **new_values}
+        if action == 'assign' and row['status'] == 'open':
+            after['status'] = 'in-progress'
+        yield row, after
@@ -0,0 +1,322 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from types import SimpleNamespace
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+from .permissions import can_view
+
+EVENT_FIELDS = ('status', 'priority', 'assigned_to')
+
+
+def event_type(before, after):
+    if before is None:
+        return 'created'
+    if after is None:
+        return 'deleted'
+    if after.get('status') == 'resolved' and (
+        before.get('status') != 'resolved'
+    ):
+        return 'resolved'
+    return 'updated'
+
+
+def make_event(ticket_id, owner_id, before, after, kind=None):
+    """
+    Event for a ticket moving from ``before`` to ``after`` state. ``kind``
+    overrides the event type the states imply.
+    """
+    state = after if after is not None else before
+    return {
+        'type': kind or event_type(before, after),
+        'owner': owner_id,
+        'ticket': {
+            'id': ticket_id,
+            'created_user': owner_id,
+            **{field: state.get(field) for field in EVENT_FIELDS},
+        },
+    }
+
+
+def can_see(user, event):
+    """Whether ``can_view`` lets ``user`` see the ticket of ``event``."""
+    return can_view(user, SimpleNamespace(created_user_id=event['owner']))
+
+
+def format_event(event, event_id):
+    data = json.dumps(event['ticket'], separators=(',', ':'))
+    return f'id: {event_id}\nevent: {event["type"]}\ndata: {data}\n\n'
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets ``text/event-stream`` requests through content negotiation.
+    Error responses are rendered as a single ``error`` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        data = json.dumps(data, separators=(',', ':'))
+        return f'event: error\ndata: {data}\n\n'.encode()
+
+
+async def acurrent_user(user):
+    """``user`` as stored now, or ``None`` once it is inactive."""
+    return await get_user_model().objects.filter(
+        pk=user.pk, is_active=True
+    ).afirst()
+
+
+class LocalEventBackend:
+    """
+    Ring buffer of the last ``size`` events of this process.
+
+    Waiting streams are woken as soon as an event is appended, but only
+    streams served by the same process see it. Event ids carry an epoch
+    unique to the buffer, so an id issued by another process or before a
+    restart is answered with a ``reset``.
+    """
+
+    def __init__(self, size):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._buffer = deque(maxlen=size)
+        self._last_id = 0
+        self._waiters = set()
+
+    def append(self, event):
+        with self._lock:
+            self._last_id += 1
+            self._buffer.append({**event, 'id': self._last_id})
+            waiters = list(self._waiters)
+        for loop, woken in waiters:
+            try:
+                loop.call_soon_threadsafe(woken.set)
+            except RuntimeError:
+                # The stream's event loop has already been closed.
+                pass
+
+    def format_id(self, event_id):
+        return f'{self.epoch}-{event_id}'
+
+    def parse_id(self, value):
+        """The position of event id ``value``, or ``None`` if not ours."""
+        epoch, _, event_id = str(value).partition('-')
+        if epoch != self.epoch or not event_id.isdigit():
+            return None
+        return int(event_id)
+
+    async def alatest_id(self):
+        with self._lock:
+            return self._last_id
+
+    def since(self, last_id):
+        """
+        Events after ``last_id``, or ``None`` when some of them are no
+        longer buffered or ``last_id`` was never issued.
+        """
+        with self._lock:
+            if last_id > self._last_id:
+                return None
+            oldest = self._buffer[0]['id'] if self._buffer else (
+                self._last_id + 1
+            )
+            if last_id < oldest - 1:
+                return None
+            return [event for event in self._buffer if event['id'] > last_id]
+
+    async def wait(self, last_id, timeout):
+        woken = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), woken)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            events = self.since(last_id)
+            if events == []:
+                try:
+                    await asyncio.wait_for(woken.wait(), timeout)
+                except TimeoutError:
+                    pass
+                events = self.since(last_id)
+            return events
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+class CacheEventBackend:
+    """
+    Ring buffer kept in Django's cache, so that every worker sharing the
+    cache (Redis, Memcached) streams the events of all of them.
+
+    Event ids come from a cache counter and each event is its own key.
+    Streams poll for new ids every ``TICKET_EVENTS_POLL_INTERVAL`` seconds.
+    """
+    prefix = 'ticket-events'
+
+    def __init__(self, size):
+        self.size = size
+
+    @property
+    def poll_interval(self):
+        return getattr(settings, 'TICKET_EVENTS_POLL_INTERVAL', 1)
+
+    def counter_key(self):
+        return f'{self.prefix}:last-id'
+
+    def event_key(self, event_id):
+        return f'{self.prefix}:{event_id}'
+
+    def format_id(self, event_id):
+        return str(event_id)
+
+    def parse_id(self, value):
+        value = str(value)
+        return int(value) if value.isdigit() else None
+
+    def append(self, event):
+        key = self.counter_key()
+        cache.add(key, 0, None)
+        event_id = cache.incr(key)
+        # Events that have left the ring are never read again, so they only
+        # need to outlive it.
+        cache.set(
+            self.event_key(event_id), {**event, 'id': event_id},
+            getattr(settings, 'TICKET_EVENTS_TTL', 3600)
+        )
+
+    async def alatest_id(self):
+        return await cache.aget(self.counter_key(), 0)
+
+    async def asince(self, last_id, skip_missing=False):
+        latest = await self.alatest_id()
+        if last_id > latest or latest - last_id > self.size:
+            return None
+        keys = [self.event_key(i) for i in range(last_id + 1, latest + 1)]
+        found = await cache.aget_many(keys)
+        events = []
+        for key in keys:
+            if key in found:
+                events.append(found[key])
+            elif not skip_missing:
+                # The id is claimed but its event is not written yet.
+                break
+        return events
+
+    async def wait(self, last_id, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            events = await self.asince(last_id)
+            if events is None or events:
+                return events
+            if loop.time() >= deadline:
+                # An id whose writer died before storing the event must not
+                # hold up the stream for good.
+                return await self.asince(last_id, skip_missing=True)
+            await asyncio.sleep(self.poll_interval)
+
+
+class TicketEventBroker:
+    """
+    Publishes ticket changes and streams them to subscribers.
+
+    Events are appended to the ``TICKET_EVENTS_BACKEND`` once the change
+    has committed. A stream resumed with the id of the last event it got
+    replays everything it missed, as long as the backend still holds it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backend = None
+
+    @property
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                backend_class = import_string(getattr(
+                    settings, 'TICKET_EVENTS_BACKEND',
+                    'tickets.events.LocalEventBackend'
+                ))
+                self._backend = backend_class(
+                    getattr(settings, 'TICKET_EVENTS_BUFFER_SIZE', 1000)
+                )
+            return self._backend
+
+    def publish(self, events, using=None):
+        events = list(events)
+        if not events:
+            return
+
+        def append():
+            for event in events:
+                self.backend.append(event)
+        transaction.on_commit(append, using=using)
+
+    async def stream(self, user, last_id=None, expires_at=None):
+        """
+        Yield the server-sent events the user may see, a keepalive comment
+        every ``TICKET_EVENTS_HEARTBEAT`` seconds, and a ``reset`` event
+        when the missed events can no longer be replayed.
+
+        The user is re-read every heartbeat, so a demoted user only sees
+        their own tickets from then on and a deactivated one is
+        disconnected. The stream also ends at ``expires_at``, the expiry
+        timestamp of the credentials it was opened with, and the client
+        has to reconnect with fresh ones.
+        """
+        backend = self.backend
+        heartbeat = getattr(settings, 'TICKET_EVENTS_HEARTBEAT', 15)
+        reset = False
+        if last_id is not None:
+            last_id = backend.parse_id(last_id)
+            reset = last_id is None
+        if last_id is None:
+            last_id = await backend.alatest_id()
+        yield f'retry: {int(heartbeat * 1000)}\n\n'
+
+        recheck_at = time.monotonic() + heartbeat
+        while True:
+            if reset:
+                reset = False
+                last_id = await backend.alatest_id()
+                yield (
+                    f'id: {backend.format_id(last_id)}\n'
+                    f'event: reset\ndata: {{}}\n\n'
+                )
+
+            timeout = heartbeat
+            if expires_at is not None:
+                timeout = min(timeout, expires_at - time.time())
+                if timeout <= 0:
+                    return
+            events = await backend.wait(last_id, timeout)
+
+            if time.monotonic() >= recheck_at:
+                user = await acurrent_user(user)
+                if user is None:
+                    return
+                recheck_at = time.monotonic() + heartbeat
+
+            if events is None:
+                reset = True
+                continue
+            if not events:
+                yield ': keepalive\n\n'
+            for event in events:
+                last_id = event['id']
+                if can_see(user, event):
+                    yield format_event(event, backend.format_id(last_id))
+
+
+ticket_events = TicketEventBroker()
@@ -0,0 +1,35 @@
+import csv
+from rest_framework.utils.encoders import JSONEncoder
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File-like object that hands back whatever the csv writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(fieldnames, records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fieldnames)
+    for record in records:
+        yield writer.writerow([record[name] for name in fieldnames])
+
+
+def stream_ndjson(fieldnames, records):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+EXPORT_WRITERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
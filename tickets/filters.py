@@ -0,0 +1,21 @@
+from rest_framework import filters
+from .search import search_tickets
+
+
+class TicketSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the ticket full-text index, ranked by relevance.
+
+    Falls back to DRF's ``icontains`` search over ``search_fields`` on
+    databases without a search index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        results = search_tickets(queryset, ' '.join(terms))
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        return results
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from tickets.archive import (
+    ARCHIVE_BATCH_SIZE, archive_cutoff, archive_resolved_tickets
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move tickets resolved more than --days ago to the archive table, '
+        'in batches that each commit on their own. Safe to interrupt and '
+        'run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Defaults to the TICKET_ARCHIVE_AFTER_DAYS setting.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        total = 0
+        for moved in archive_resolved_tickets(cutoff, options['batch_size']):
+            total += moved
+            self.stdout.write(f'Archived {moved} ticket(s).')
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total} ticket(s) resolved before {cutoff:%Y-%m-%d}.'
+        ))
@@ -0,0 +1,321 @@
+import json
+import math
+import platform
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from accounts.tokens import UserStateRefreshToken
+from tickets.models import Ticket
+from .seed_data import SEED_PASSWORD
+
+
+class Endpoint:
+    """One benchmarked request; ``prepare`` builds per-iteration kwargs."""
+
+    def __init__(self, name, method, path, user=None, data=None,
+                 prepare=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.user = user
+        self.data = data
+        self.prepare = prepare
+
+    def request_kwargs(self, iteration):
+        kwargs = {'path': self.path, 'data': self.data}
+        if self.prepare is not None:
+            kwargs.update(self.prepare(iteration))
+        return kwargs
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every route in tickets.urls and accounts.urls, except the '
+        'never-ending events stream, through the Django test client and '
+        'report p50/p95/p99 latency and query counts as JSON. Run it '
+        'against a database filled by seed_data; write endpoints modify '
+        'that data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--output',
+            default='bench_output.json',
+            help='Where to write the machine-readable results.',
+        )
+        parser.add_argument(
+            '--only',
+            action='append',
+            default=[],
+            help='Only run endpoints whose name contains this value.',
+        )
+
+    def handle(self, *args, **options):
+        admin = User.objects.filter(is_staff=True, is_active=True).first()
+        user = User.objects.filter(
+            is_staff=False, is_active=True, ticket__isnull=False
+        ).first()
+        if admin is None or user is None:
+            raise CommandError(
+                'Needs an active admin and a user with tickets; '
+                'run `manage.py seed_data` first.'
+            )
+
+        endpoints = self.build_endpoints(admin, user)
+        if options['only']:
+            endpoints = [
+                endpoint for endpoint in endpoints
+                if any(part in endpoint.name for part in options['only'])
+            ]
+
+        clients = {
+            admin.pk: self.client_for(admin),
+            user.pk: self.client_for(user),
+            None: APIClient(),
+        }
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for endpoint in endpoints:
+                client = clients[endpoint.user.pk if endpoint.user else None]
+                results[endpoint.name] = self.run_endpoint(
+                    client, endpoint, options['warmup'],
+                    options['iterations']
+                )
+                self.stdout.write(self.format_row(endpoint.name,
+                                                  results[endpoint.name]))
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'iterations': options['iterations'],
+                'users': User.objects.count(),
+                'tickets': Ticket.objects.count(),
+                'settings': {
+                    'TICKET_STATS_COUNTERS': getattr(
+                        settings, 'TICKET_STATS_COUNTERS', None
+                    ),
+                    'ASYNC_READ_VIEWS': getattr(
+                        settings, 'ASYNC_READ_VIEWS', None
+                    ),
+                },
+            },
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write('\n')
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote results for {len(results)} endpoints to "
+            f"{options['output']}."
+        ))
+
+    def client_for(self, user):
+        client = APIClient()
+        token = UserStateRefreshToken.for_user(user)
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {token.access_token}'
+        )
+        return client
+
+    def run_endpoint(self, client, endpoint, warmup, iterations):
+        timings = []
+        queries = []
+        statuses = set()
+        for iteration in range(warmup + iterations):
+            kwargs = endpoint.request_kwargs(iteration)
+            method = getattr(client, endpoint.method)
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = method(
+                    kwargs['path'], kwargs.get('data'), format='json'
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if iteration < warmup:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+
+        return {
+            'method': endpoint.method.upper(),
+            'path': endpoint.path,
+            'status_codes': sorted(statuses),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries_median': statistics.median(queries),
+            'queries_max': max(queries),
+        }
+
+    def format_row(self, name, result):
+        return (
+            f"{name:<32} p50={result['p50_ms']:>9.2f}ms "
+            f"p95={result['p95_ms']:>9.2f}ms "
+            f"p99={result['p99_ms']:>9.2f}ms "
+            f"queries={result['queries_median']} "
+            f"status={result['status_codes']}"
+        )
+
+    def build_endpoints(self, admin, user):
+        ticket = Ticket.objects.filter(
+            created_user=user
+        ).exclude(status='resolved').first() or Ticket.objects.filter(
+            created_user=user
+        ).first()
+        bulk_ids = list(
+            Ticket.objects.exclude(status='resolved').values_list(
+                'id', flat=True
+            )[:100]
+        )
+        target = User.objects.filter(is_staff=False).exclude(
+            pk=user.pk
+        ).first() or user
+        agent_id = Ticket.objects.filter(
+            assignee__isnull=False
+        ).values_list('assignee', flat=True).first() or admin.pk
+        stamp = int(time.time())
+
+        def next_refresh(iteration):
+            # Rotation blacklists every token that is refreshed, so each
+            # request gets a freshly minted one.
+            return {'data': {
+                'refresh': str(UserStateRefreshToken.for_user(user))
+            }}
+
+        def new_ticket(iteration):
+            created = Ticket.objects.create(
+                title=f'Benchmark delete {iteration}',
+                description='Created by benchmark_api',
+                created_user=user,
+            )
+            return {'path': reverse('ticket-detail', args=[created.pk])}
+
+        ticket_list = reverse('ticket-list')
+        return [
+            Endpoint(
+                'auth.login', 'post', reverse('login'),
+                data={'email': user.email, 'password': SEED_PASSWORD},
+            ),
+            Endpoint(
+                'auth.token_refresh', 'post', reverse('token_refresh'),
+                prepare=next_refresh,
+            ),
+            Endpoint(
+                'auth.logout', 'post', reverse('logout'), user=user,
+                prepare=lambda i: {'data': {
+                    'refresh': str(UserStateRefreshToken.for_user(user))
+                }},
+            ),
+            Endpoint('auth.status', 'get', reverse('user-status'), user=user),
+            Endpoint(
+                'auth.register', 'post', reverse('register'), user=admin,
+                prepare=lambda i: {'data': {
+                    'email': f'bench-register-{stamp}-{i}@example.com',
+                    'password': SEED_PASSWORD,
+                    'confirm_password': SEED_PASSWORD,
+                    'role': 'user',
+                }},
+            ),
+            Endpoint(
+                'auth.user_stats', 'get', reverse('user-stats'), user=admin
+            ),
+            Endpoint(
+                'auth.user_list', 'get', reverse('user_list'), user=admin
+            ),
+            Endpoint(
+                'auth.user_status_update', 'patch',
+                reverse('user_status_update', args=[target.pk]),
+                user=admin, data={'is_active': True},
+            ),
+            Endpoint(
+                'tickets.stats', 'get', reverse('ticket-stats'), user=admin
+            ),
+            Endpoint(
+                'tickets.user_stats', 'get', reverse('user-ticket-stats'),
+                user=user,
+            ),
+            Endpoint('tickets.list.owner', 'get', ticket_list, user=user),
+            Endpoint('tickets.list.staff', 'get', ticket_list, user=admin),
+            Endpoint(
+                'tickets.list.staff_filtered', 'get',
+                f'{ticket_list}?status=open&priority=high', user=admin,
+            ),
+            Endpoint(
+                'tickets.list.staff_search', 'get',
+                f'{ticket_list}?search=printer', user=admin,
+            ),
+            Endpoint(
+                'tickets.list.staff_page_size_50', 'get',
+                f'{ticket_list}?page_size=50', user=admin,
+            ),
+            Endpoint(
+                'tickets.list.staff_deep_page', 'get',
+                f'{ticket_list}?page=50&page_size=50', user=admin,
+            ),
+            Endpoint(
+                'tickets.list.staff_cursor', 'get',
+                f'{ticket_list}?pagination=cursor&page_size=50', user=admin,
+            ),
+            Endpoint(
+                'tickets.detail', 'get',
+                reverse('ticket-detail', args=[ticket.pk]), user=user,
+            ),
+            Endpoint(
+                'tickets.create', 'post', ticket_list, user=user,
+                data={
+                    'title': 'Benchmark ticket',
+                    'description': 'Created by benchmark_api',
+                    'priority': 'medium',
+                },
+            ),
+            Endpoint(
+                'tickets.update', 'patch',
+                reverse('ticket-detail', args=[ticket.pk]), user=user,
+                prepare=lambda i: {'data': {'title': f'Benchmark edit {i}'}},
+            ),
+            Endpoint(
+                'tickets.delete', 'delete', ticket_list, user=user,
+                prepare=new_ticket,
+            ),
+            Endpoint(
+                'tickets.queue', 'get',
+                f"{reverse('ticket-queue')}?assignee={agent_id}", user=admin,
+            ),
+            Endpoint(
+                'tickets.workload', 'get', reverse('ticket-workload'),
+                user=admin,
+            ),
+            Endpoint(
+                'tickets.export', 'get',
+                f"{reverse('ticket-export')}?file_format=ndjson", user=user,
+            ),
+            Endpoint(
+                'tickets.bulk', 'post', reverse('ticket-bulk'), user=admin,
+                prepare=lambda i: {'data': {
+                    'ids': bulk_ids,
+                    'action': 'prioritize',
+                    'priority': ['low', 'medium', 'high'][i % 3],
+                }},
+            ),
+        ]
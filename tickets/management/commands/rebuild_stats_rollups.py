@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from accounts.stats import rebuild_user_growth_rollup
+from tickets.stats import rebuild_ticket_creation_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily ticket creation and user growth rollups.'
+
+    def handle(self, *args, **options):
+        days = rebuild_ticket_creation_rollup()
+        self.stdout.write(f'Ticket creation: {days} day(s).')
+        days = rebuild_user_growth_rollup()
+        self.stdout.write(f'User growth: {days} day(s).')
+        self.stdout.write(self.style.SUCCESS('Rollups rebuilt.'))
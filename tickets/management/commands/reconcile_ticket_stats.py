@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from tickets.stats import reconcile_counters, reconcile_user_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the ticket stats counters and the per-user ticket counters '
+        'from the tickets table.'
+    )
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters()
+        for field, value, stored, actual in drift:
+            self.stdout.write(
+                f'{field}={value}: stored {stored}, actual {actual}'
+            )
+
+        user_drift = reconcile_user_counters()
+        for user_id, stored, actual in user_drift:
+            self.stdout.write(
+                f'user {user_id}: stored {stored}, actual {actual}'
+            )
+
+        if not drift and not user_drift:
+            self.stdout.write(self.style.SUCCESS('Counters are in sync.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {len(drift)} counter(s) and '
+            f'{len(user_drift)} user counter(s).'
+        ))
@@ -0,0 +1,151 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.models import User
+from tickets.models import Ticket, queue_rank
+from accounts.stats import rebuild_user_growth_rollup
+from tickets.stats import (
+    reconcile_counters, reconcile_user_counters,
+    rebuild_ticket_creation_rollup
+)
+
+SEED_PASSWORD = 'Bench@1234'
+
+STATUS_WEIGHTS = {'open': 30, 'in-progress': 25, 'resolved': 45}
+PRIORITY_WEIGHTS = {'low': 50, 'medium': 35, 'high': 15}
+
+TITLES = [
+    'Cannot log in to the VPN',
+    'Printer on floor {n} is jammed',
+    'Laptop battery drains quickly',
+    'Request access to shared drive {n}',
+    'Email not syncing on phone',
+    'Monitor flickers after update',
+    'Software licence renewal for team {n}',
+    'Password reset link expired',
+]
+
+
+@contextmanager
+def manual_timestamps(model, *field_names):
+    """Let bulk_create keep the timestamps we generate for old rows."""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generate users and tickets with realistic status, priority '
+        'and monthly distributions for local benchmarking.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--admins', type=int, default=5)
+        parser.add_argument('--tickets', type=int, default=50000)
+        parser.add_argument('--months', type=int, default=12)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        span = timedelta(days=30 * options['months'])
+        password = make_password(SEED_PASSWORD)
+        start = User.objects.count()
+
+        users = [
+            User(
+                email=f'bench-user-{start + i}@example.com',
+                password=password,
+                date_joined=self.random_moment(rng, now, span),
+                last_login=self.random_moment(rng, now, span / 4),
+            )
+            for i in range(options['users'])
+        ]
+        admins = [
+            User(
+                email=f'bench-admin-{start + i}@example.com',
+                password=password,
+                role='admin',
+                is_staff=True,
+                is_superuser=True,
+                date_joined=self.random_moment(rng, now, span),
+            )
+            for i in range(options['admins'])
+        ]
+        User.objects.bulk_create(
+            users + admins, batch_size=options['batch_size']
+        )
+        self.stdout.write(
+            f'Created {len(users)} users and {len(admins)} admins.'
+        )
+
+        user_ids = list(
+            User.objects.filter(is_staff=False).values_list('id', flat=True)
+        )
+        agents = list(
+            User.objects.filter(is_staff=True).values_list('id', 'email')
+        )
+        if not user_ids:
+            self.stdout.write('No users to own tickets; skipping tickets.')
+            return
+
+        created = 0
+        with manual_timestamps(Ticket, 'created_at', 'updated_at'):
+            while created < options['tickets']:
+                size = min(options['batch_size'], options['tickets'] - created)
+                Ticket.objects.bulk_create(
+                    self.build_ticket(
+                        rng, now, span, user_ids, agents, created + i
+                    )
+                    for i in range(size)
+                )
+                created += size
+                self.stdout.write(f'Created {created} tickets.')
+
+        reconcile_counters()
+        reconcile_user_counters()
+        rebuild_ticket_creation_rollup()
+        rebuild_user_growth_rollup()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users) + len(admins)} users and {created} tickets '
+            f'(password: {SEED_PASSWORD}).'
+        ))
+
+    def random_moment(self, rng, now, span):
+        # Squaring skews towards recent dates so that volume grows over time.
+        return now - span * (rng.random() ** 2)
+
+    def build_ticket(self, rng, now, span, user_ids, agents, n):
+        status = self.weighted(rng, STATUS_WEIGHTS)
+        priority = self.weighted(rng, PRIORITY_WEIGHTS)
+        created_at = self.random_moment(rng, now, span)
+        assignee_id = assigned_to = None
+        if status != 'open' and agents:
+            assignee_id, assigned_to = rng.choice(agents)
+        return Ticket(
+            title=rng.choice(TITLES).format(n=n % 50),
+            description=f'Seeded ticket #{n}. ' * rng.randint(1, 20),
+            priority=priority,
+            status=status,
+            queue_rank=queue_rank(status, priority),
+            assigned_to=assigned_to,
+            assignee_id=assignee_id,
+            created_user_id=rng.choice(user_ids),
+            created_at=created_at,
+            updated_at=created_at + (now - created_at) * rng.random(),
+        )
+
+    def weighted(self, rng, weights):
+        return rng.choices(list(weights), list(weights.values()))[0]
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from ticsol.cache import STATS_CACHES
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters for the dashboard stats caches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after printing them.',
+        )
+
+    def handle(self, *args, **options):
+        for stats_cache in STATS_CACHES:
+            metrics = stats_cache.metrics()
+            self.stdout.write(
+                f"{stats_cache.namespace}: hits={metrics['hits']} "
+                f"misses={metrics['misses']} "
+                f"hit_ratio={metrics['hit_ratio']}"
+            )
+            if options['reset']:
+                stats_cache.reset_metrics()
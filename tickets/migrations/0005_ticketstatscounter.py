@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:44
+
+from django.db import migrations, models
+from django.db.models import Count
+
+COUNTED_FIELDS = {
+    'status': ['open', 'in-progress', 'resolved'],
+    'priority': ['low', 'medium', 'high'],
+}
+
+
+def seed_counters(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketStatsCounter = apps.get_model('tickets', 'TicketStatsCounter')
+    db_alias = schema_editor.connection.alias
+
+    counters = []
+    for field, values in COUNTED_FIELDS.items():
+        counts = dict.fromkeys(values, 0)
+        rows = Ticket.objects.using(db_alias).values(field).annotate(
+            count=Count('id')
+        ).order_by()
+        for row in rows:
+            counts[row[field]] = row['count']
+        counters.extend(
+            TicketStatsCounter(field=field, value=value, count=count)
+            for value, count in counts.items()
+        )
+    TicketStatsCounter.objects.using(db_alias).bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_alter_ticket_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStatsCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('field', 'value'), name='unique_ticket_stats_counter')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:52
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE tickets_ticket_fts USING fts5(
+        title, description, assigned_to,
+        content='tickets_ticket', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER tickets_ticket_fts_insert AFTER INSERT ON tickets_ticket
+    BEGIN
+        INSERT INTO tickets_ticket_fts(rowid, title, description, assigned_to)
+        VALUES (new.id, new.title, new.description, new.assigned_to);
+    END
+    """,
+    """
+    CREATE TRIGGER tickets_ticket_fts_delete AFTER DELETE ON tickets_ticket
+    BEGIN
+        INSERT INTO tickets_ticket_fts(
+            tickets_ticket_fts, rowid, title, description, assigned_to
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.assigned_to);
+    END
+    """,
+    """
+    CREATE TRIGGER tickets_ticket_fts_update
+    AFTER UPDATE OF title, description, assigned_to ON tickets_ticket
+    BEGIN
+        INSERT INTO tickets_ticket_fts(
+            tickets_ticket_fts, rowid, title, description, assigned_to
+        )
+        VALUES ('delete', old.id, old.title, old.description, old.assigned_to);
+        INSERT INTO tickets_ticket_fts(rowid, title, description, assigned_to)
+        VALUES (new.id, new.title, new.description, new.assigned_to);
+    END
+    """,
+    "INSERT INTO tickets_ticket_fts(tickets_ticket_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS tickets_ticket_fts_update',
+    'DROP TRIGGER IF EXISTS tickets_ticket_fts_delete',
+    'DROP TRIGGER IF EXISTS tickets_ticket_fts_insert',
+    'DROP TABLE IF EXISTS tickets_ticket_fts',
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE tickets_ticket ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(assigned_to, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    """
+    CREATE INDEX ticket_search_vector_idx ON tickets_ticket
+    USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS ticket_search_vector_idx',
+    'ALTER TABLE tickets_ticket DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sqlite_compileoption_used('ENABLE_FTS5')"
+        )
+        return bool(cursor.fetchone()[0])
+
+
+def run_statements(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run_statements(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite' and sqlite_has_fts5(schema_editor):
+        run_statements(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        run_statements(schema_editor, POSTGRES_REVERSE)
+    elif vendor == 'sqlite':
+        run_statements(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_ticket_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:11
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollup(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketCreationRollup = apps.get_model('tickets', 'TicketCreationRollup')
+    db_alias = schema_editor.connection.alias
+
+    days = Ticket.objects.using(db_alias).order_by().annotate(
+        rollup_day=TruncDate('created_at')
+    ).values('rollup_day').annotate(total=Count('id'))
+    TicketCreationRollup.objects.using(db_alias).bulk_create(
+        TicketCreationRollup(day=row['rollup_day'], count=row['total']) for row in days
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_ticket_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketCreationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+STATUS_COLUMNS = {
+    'open': 'open',
+    'in-progress': 'in_progress',
+    'resolved': 'resolved',
+}
+
+
+def seed_user_counters(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    UserTicketCounter = apps.get_model('tickets', 'UserTicketCounter')
+    db_alias = schema_editor.connection.alias
+
+    counters = {}
+    rows = Ticket.objects.using(db_alias).values(
+        'created_user_id', 'status'
+    ).annotate(count=Count('id')).order_by()
+    for row in rows:
+        counter = counters.setdefault(
+            row['created_user_id'],
+            UserTicketCounter(user_id=row['created_user_id'])
+        )
+        setattr(counter, STATUS_COLUMNS[row['status']], row['count'])
+    UserTicketCounter.objects.using(db_alias).bulk_create(
+        counters.values(), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_usergrowthrollup'),
+        ('tickets', '0008_ticketcreationrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTicketCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ticket_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open', models.BigIntegerField(default=0)),
+                ('in_progress', models.BigIntegerField(default=0)),
+                ('resolved', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_user_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+QUEUE_STATUSES = ['open', 'in-progress']
+
+PRIORITY_RANKS = {'high': 0, 'medium': 1, 'low': 2}
+
+
+def agent_lookup(User, db_alias):
+    """
+    Staff accounts by lower-cased email, and by the part of the email
+    before the @ when only one staff account has it.
+    """
+    agents = {}
+    local_parts = {}
+    emails = User.objects.using(db_alias).filter(
+        is_staff=True
+    ).values_list('id', 'email')
+    for user_id, email in emails:
+        email = email.lower()
+        agents[email] = user_id
+        local_parts.setdefault(email.split('@')[0], []).append(user_id)
+    for name, user_ids in local_parts.items():
+        if len(user_ids) == 1:
+            agents.setdefault(name, user_ids[0])
+    return agents
+
+
+def map_assignees(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    User = apps.get_model('accounts', 'User')
+    db_alias = schema_editor.connection.alias
+    tickets = Ticket.objects.using(db_alias)
+
+    for priority, rank in PRIORITY_RANKS.items():
+        tickets.filter(
+            status__in=QUEUE_STATUSES, priority=priority
+        ).update(queue_rank=rank)
+
+    agents = agent_lookup(User, db_alias)
+    names = tickets.exclude(assigned_to=None).exclude(
+        assigned_to=''
+    ).values_list('assigned_to', flat=True).distinct().order_by()
+    for name in list(names):
+        user_id = agents.get(name.strip().lower())
+        if user_id is not None:
+            tickets.filter(assigned_to=name).update(assignee_id=user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_userticketcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='assignee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_tickets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='queue_rank',
+            field=models.SmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(map_assignees, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('queue_rank__isnull', False)), fields=['assignee', 'queue_rank', 'created_at', 'id'], name='ticket_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_ticket_assignee_staff'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=10)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('in-progress', 'In-Progress'), ('resolved', 'Resolved')], max_length=20)),
+                ('assigned_to', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('assignee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('created_user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_tickets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at', '-id'], name='archived_created_idx'), models.Index(fields=['created_user', '-created_at', '-id'], name='archived_owner_created_idx'), models.Index(fields=['status', 'priority'], name='archived_status_priority_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:05
+
+from django.db import migrations
+
+FTS_TABLE = 'tickets_ticket_fts'
+
+SQLITE_FTS = """
+    CREATE VIRTUAL TABLE tickets_ticket_fts USING fts5(
+        title, description, assigned_to,
+        content='tickets_ticket', content_rowid='id',
+        tokenize='{tokenize}'
+    )
+"""
+
+POSTGRES_VECTOR = """
+    ALTER TABLE tickets_ticket ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{config}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{config}', coalesce(assigned_to, '')), 'B') ||
+        setweight(to_tsvector('{config}', coalesce(description, '')), 'C')
+    ) STORED
+"""
+
+
+def rebuild_sqlite_index(schema_editor, tokenize):
+    with schema_editor.connection.cursor() as cursor:
+        tables = schema_editor.connection.introspection.table_names(cursor)
+    if FTS_TABLE not in tables:
+        return
+    # The sync triggers only name the table, so they survive the rebuild.
+    schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+    schema_editor.execute(SQLITE_FTS.format(tokenize=tokenize))
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+    )
+
+
+def rebuild_postgres_index(schema_editor, config):
+    schema_editor.execute('DROP INDEX IF EXISTS ticket_search_vector_idx')
+    schema_editor.execute(
+        'ALTER TABLE tickets_ticket DROP COLUMN IF EXISTS search_vector'
+    )
+    schema_editor.execute(POSTGRES_VECTOR.format(config=config))
+    schema_editor.execute(
+        'CREATE INDEX ticket_search_vector_idx ON tickets_ticket '
+        'USING GIN (search_vector)'
+    )
+
+
+def rebuild_search_index(schema_editor, config, tokenize):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        rebuild_postgres_index(schema_editor, config)
+    elif vendor == 'sqlite':
+        rebuild_sqlite_index(schema_editor, tokenize)
+
+
+def index_without_stemming(apps, schema_editor):
+    rebuild_search_index(schema_editor, 'simple', 'unicode61')
+
+
+def index_with_stemming(apps, schema_editor):
+    rebuild_search_index(schema_editor, 'english', 'porter unicode61')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_archivedticket'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_without_stemming, index_with_stemming),
+    ]
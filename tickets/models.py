@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, router, transaction
+from ticsol.rollups import DailyRollup
 from accounts.models import User
 
 PRIORITY_CHOICES = [
@@ -13,6 +14,18 @@ STATUS_CHOICES = [
     ('resolved', 'Resolved'),
 ]
 
+# Statuses of the tickets still in an agent's work queue.
+QUEUE_STATUSES = ['open', 'in-progress']
+
+# Work queue order of the priorities, most urgent first.
+PRIORITY_RANKS = {'high': 0, 'medium': 1, 'low': 2}
+
+
+def queue_rank(status, priority):
+    if status not in QUEUE_STATUSES:
+        return None
+    return PRIORITY_RANKS.get(priority)
+
 
 class Ticket(models.Model):
     title = models.CharField(max_length=255)
@@ -30,19 +43,213 @@ class Ticket(models.Model):
     created_user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        # Covered by the leading column of the composite owner indexes.
+        db_index=False,
     )
     assigned_to = models.CharField(
         max_length=255,
         null=True,
         blank=True
     )
+    assignee = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='assigned_tickets',
+        limit_choices_to={'is_staff': True}
+    )
+    # Priority rank while the ticket is in a work queue, ``None`` once it is
+    # resolved; kept by ``save()`` and the bulk actions.
+    queue_rank = models.SmallIntegerField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields whose persisted values are re-read, with the row locked, before
+    # a save or delete so that signal handlers can tell what it changed.
+    TRACKED_FIELDS = ('status', 'priority')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Staff list, recent tickets and the by-month stats range.
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='ticket_created_idx'
+            ),
+            # Owner-scoped list in TicketViewSet.get_queryset.
+            models.Index(
+                fields=['created_user', '-created_at', '-id'],
+                name='ticket_owner_created_idx'
+            ),
+            # Per-user status breakdown and ?status= on the owner list.
+            models.Index(
+                fields=['created_user', 'status', '-created_at', '-id'],
+                name='ticket_owner_status_idx'
+            ),
+            # ?status= and ?priority= filters on the list.
+            models.Index(
+                fields=['status', '-created_at', '-id'],
+                name='ticket_status_created_idx'
+            ),
+            models.Index(
+                fields=['priority', '-created_at', '-id'],
+                name='ticket_priority_created_idx'
+            ),
+            # Agent work queues, most urgent and oldest first, and the
+            # workload counts, which read nothing else.
+            models.Index(
+                fields=['assignee', 'queue_rank', 'created_at', 'id'],
+                name='ticket_queue_idx',
+                condition=models.Q(queue_rank__isnull=False)
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = instance.tracked_state()
+        return instance
+
+    def tracked_state(self):
+        return {
+            field: self.__dict__.get(field) for field in self.TRACKED_FIELDS
+        }
 
     def save(self, *args, **kwargs):
-        if self.assigned_to and self.status == 'open':
+        if (self.assigned_to or self.assignee_id) and self.status == 'open':
             self.status = 'in-progress'
-        super().save(*args, **kwargs)
+        self.queue_rank = queue_rank(self.status, self.priority)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and (
+            {'status', 'priority'} & set(update_fields)
+        ):
+            kwargs['update_fields'] = {*update_fields, 'queue_rank'}
+        using = kwargs.get('using') or router.db_for_write(
+            Ticket, instance=self
+        )
+        with transaction.atomic(using=using):
+            self.lock_state(using)
+            super().save(*args, **kwargs)
+        self._loaded_state = self.tracked_state()
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(Ticket, instance=self)
+        with transaction.atomic(using=using):
+            self.lock_state(using)
+            return super().delete(using, keep_parents)
+
+    def lock_state(self, using):
+        """
+        Lock the row until the transaction ends and remember its persisted
+        state, so that the counter deltas of the signal handlers are taken
+        against the row as it is now rather than as it was read.
+        """
+        if self.pk is None:
+            return
+        self._loaded_state = Ticket._base_manager.using(using).filter(
+            pk=self.pk
+        ).select_for_update().values(*self.TRACKED_FIELDS).first()
+
+
+class TicketStatsCounter(models.Model):
+    """Running ticket count for one status or priority value."""
+    field = models.CharField(max_length=20)
+    value = models.CharField(max_length=20)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['field', 'value'],
+                name='unique_ticket_stats_counter'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.field}={self.value}: {self.count}'
+
+
+class UserTicketCounter(models.Model):
+    """Running per-status ticket counts of one user's tickets."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ticket_counter'
+    )
+    open = models.BigIntegerField(default=0)
+    in_progress = models.BigIntegerField(default=0)
+    resolved = models.BigIntegerField(default=0)
+
+    # Counter column of each ticket status.
+    STATUS_COLUMNS = {
+        'open': 'open',
+        'in-progress': 'in_progress',
+        'resolved': 'resolved',
+    }
+
+    def __str__(self):
+        return (
+            f'{self.user_id}: {self.open} open, {self.in_progress} '
+            f'in progress, {self.resolved} resolved'
+        )
+
+
+class TicketCreationRollup(DailyRollup):
+    """Tickets created per day, by ``created_at``."""
+
+
+class ArchivedTicket(models.Model):
+    """
+    A resolved ticket moved out of the tickets table by the
+    ``archive_tickets`` command, under its original id. Archived tickets
+    are read-only.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    created_user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_tickets',
+        # Covered by the leading column of the owner index.
+        db_index=False,
+    )
+    assigned_to = models.CharField(max_length=255, null=True, blank=True)
+    assignee = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    # Columns copied over from the tickets table.
+    COPIED_FIELDS = (
+        'id', 'title', 'description', 'priority', 'status', 'created_user_id',
+        'assigned_to', 'assignee_id', 'created_at', 'updated_at'
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='archived_created_idx'
+            ),
+            models.Index(
+                fields=['created_user', '-created_at', '-id'],
+                name='archived_owner_created_idx'
+            ),
+            # Covers the status and priority counts.
+            models.Index(
+                fields=['status', 'priority'],
+                name='archived_status_priority_idx'
+            ),
+        ]
@@ -1,7 +1,12 @@
 from rest_framework.pagination import PageNumberPagination
+from ticsol.pagination import KeysetPagination
 
 
 class TicketPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 50
+
+
+class TicketCursorPagination(KeysetPagination):
+    ordering_field = 'created_at'
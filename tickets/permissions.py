@@ -1,19 +1,46 @@
+from django.db.models import Q
 from rest_framework import permissions
 
+# The ticket access rules, each both as a queryset filter and as a check of
+# an already loaded ticket. Both compare ``created_user_id`` so neither
+# loads the owner.
+
+
+def visible_tickets(user):
+    """Admins see every ticket, users only the ones they created."""
+    if user.is_staff:
+        return Q()
+    return Q(created_user_id=user.pk)
+
+
+def editable_tickets(user):
+    """Visible tickets that are not resolved."""
+    return visible_tickets(user) & ~Q(status='resolved')
+
+
+def filter_visible(queryset, user):
+    return queryset.filter(visible_tickets(user))
+
+
+def filter_editable(queryset, user):
+    return queryset.filter(editable_tickets(user))
+
+
+def can_view(user, ticket):
+    return user.is_staff or ticket.created_user_id == user.pk
+
+
+def can_edit(user, ticket):
+    return ticket.status != 'resolved' and can_view(user, ticket)
+
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if request.user.is_staff:
-            return True
-        return obj.created_user == request.user
+        return can_view(request.user, obj)
 
 
 class CanEditTicket(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        if obj.status == 'resolved':
-            return False
-        if request.user.is_staff:
-            return True
-        return request.user == obj.created_user
+        return can_edit(request.user, obj)
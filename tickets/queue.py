@@ -0,0 +1,51 @@
+from django.db.models import Count, Q
+from accounts.models import User
+from .models import Ticket, PRIORITY_RANKS
+
+
+def find_assignee(name):
+    """
+    The staff account an ``assigned_to`` name refers to: the one with that
+    email, else the only one whose email starts with ``name@``.
+    """
+    name = (name or '').strip()
+    if not name:
+        return None
+    staff = User.objects.filter(is_staff=True)
+    agent = staff.filter(email__iexact=name).first()
+    if agent is None and '@' not in name:
+        matches = list(staff.filter(email__istartswith=f'{name}@')[:2])
+        if len(matches) == 1:
+            agent = matches[0]
+    return agent
+
+
+def agent_queue(agent_id):
+    """The agent's open and in-progress tickets, most urgent then oldest."""
+    return Ticket.objects.filter(
+        assignee_id=agent_id, queue_rank__isnull=False
+    ).order_by('queue_rank', 'created_at', 'id')
+
+
+def agent_workloads():
+    """
+    Open and in-progress ticket counts per agent, in total and by priority,
+    in one query over the queue index.
+    """
+    counts = {
+        priority: Count('id', filter=Q(queue_rank=rank))
+        for priority, rank in PRIORITY_RANKS.items()
+    }
+    rows = Ticket.objects.filter(
+        assignee__isnull=False, queue_rank__isnull=False
+    ).values('assignee').annotate(
+        total=Count('id'), **counts
+    ).order_by('assignee')
+    return [
+        {
+            'assignee': row['assignee'],
+            'total': row['total'],
+            'byPriority': {priority: row[priority] for priority in counts},
+        }
+        for row in rows
+    ]
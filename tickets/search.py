@@ -0,0 +1,162 @@
+import re
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVectorField
+)
+from django.db import connections
+from django.db.models import Expression, F
+from django.db.models.expressions import RawSQL
+
+TICKET_TABLE = 'tickets_ticket'
+FTS_TABLE = 'tickets_ticket_fts'
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+class SearchVectorColumn(Expression):
+    """
+    The ``search_vector`` column, which the model does not declare, of the
+    query's own tickets table, also when the query is nested in another.
+    """
+    output_field = SearchVectorField()
+
+    def as_sql(self, compiler, connection):
+        table = compiler.quote_name_unless_alias(
+            compiler.query.get_initial_alias()
+        )
+        return f'{table}.search_vector', []
+
+
+class PostgresSearchBackend:
+    """
+    Matches against the generated ``search_vector`` tsvector column, which
+    is kept in sync by PostgreSQL itself and served by a GIN index.
+
+    The column and the queries use the ``simple`` configuration, which
+    neither stems nor drops stop words, so that results match the FTS5
+    index on SQLite.
+    """
+    vendor = 'postgresql'
+    config = 'simple'
+
+    def is_available(self, connection):
+        return True
+
+    def get_query(self, terms):
+        return SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            config=self.config, search_type='raw'
+        )
+
+    def search(self, queryset, terms):
+        query = self.get_query(terms)
+        return queryset.alias(search_vector=SearchVectorColumn()).filter(
+            search_vector=query
+        ).annotate(search_rank=SearchRank(F('search_vector'), query))
+
+    def matching_ids(self, queryset, terms):
+        return queryset.alias(search_vector=SearchVectorColumn()).filter(
+            search_vector=self.get_query(terms)
+        ).values('pk')
+
+
+class SQLiteSearchBackend:
+    """
+    Matches against the FTS5 shadow table that the triggers installed by
+    the tickets migrations keep in sync with the tickets table.
+    """
+    vendor = 'sqlite'
+
+    def __init__(self):
+        self._available = {}
+
+    def is_available(self, connection):
+        if connection.alias not in self._available:
+            with connection.cursor() as cursor:
+                tables = connection.introspection.table_names(cursor)
+            self._available[connection.alias] = FTS_TABLE in tables
+        return self._available[connection.alias]
+
+    def get_query(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, terms):
+        return queryset.extra(
+            # bm25 scores are lower for better matches; the weights favour
+            # title, then assignee, then description.
+            select={'search_rank': f'-bm25({FTS_TABLE}, 10.0, 1.0, 5.0)'},
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {TICKET_TABLE}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[self.get_query(terms)],
+        )
+
+    def matching_ids(self, queryset, terms):
+        # The join in ``search()`` names the tickets table, which is
+        # aliased once nested in another query.
+        return RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self.get_query(terms)]
+        )
+
+
+BACKENDS = [PostgresSearchBackend(), SQLiteSearchBackend()]
+
+
+def get_backend(using):
+    connection = connections[using]
+    for backend in BACKENDS:
+        if backend.vendor == connection.vendor:
+            if backend.is_available(connection):
+                return backend
+            return None
+    return None
+
+
+def get_search(queryset, text):
+    """
+    The search backend for ``queryset`` and the terms of ``text``, or
+    ``None`` when the database has no search index, or for the archive
+    table, which has none.
+    """
+    if queryset.model._meta.db_table != TICKET_TABLE:
+        return None
+    backend = get_backend(queryset.db)
+    if backend is None:
+        return None
+    return backend, TOKEN_RE.findall(text.lower())
+
+
+def search_tickets(queryset, text):
+    """
+    Filter ``queryset`` to tickets matching ``text`` through the full-text
+    index, best matches first. Returns ``None`` without an index (see
+    ``get_search()``), so callers can fall back to a plain ``icontains``
+    search.
+    """
+    search = get_search(queryset, text)
+    if search is None:
+        return None
+    backend, terms = search
+    if not terms:
+        return queryset.none()
+
+    return backend.search(queryset, terms).order_by(
+        '-search_rank', '-created_at', '-id'
+    )
+
+
+def matching_ticket_ids(queryset, text):
+    """
+    Ids of the tickets matching ``text``, unordered, for a ``pk__in``
+    filter nested in another query on ``queryset``. Returns ``None``
+    without an index, like ``search_tickets()``.
+    """
+    search = get_search(queryset, text)
+    if search is None:
+        return None
+    backend, terms = search
+    if not terms:
+        return queryset.none().values('pk')
+    return backend.matching_ids(queryset, terms)
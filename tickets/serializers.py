@@ -1,13 +1,39 @@
+from functools import cache
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
 from rest_framework import serializers
-from .models import Ticket
+from accounts.models import User
+from .models import Ticket, PRIORITY_CHOICES
+from .bulk import BULK_MAX_TICKETS
+from .queue import find_assignee
+
+# Fields whose ``to_representation`` returns database values unchanged.
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def resolve_assignment(attrs):
+    """Fill in whichever of ``assignee`` and ``assigned_to`` was left out."""
+    if 'assignee' in attrs and 'assigned_to' not in attrs:
+        assignee = attrs['assignee']
+        attrs['assigned_to'] = assignee.email if assignee else None
+    elif 'assigned_to' in attrs and 'assignee' not in attrs:
+        attrs['assignee'] = find_assignee(attrs['assigned_to'])
+    return attrs
 
 
 class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
-        fields = '__all__'
+        exclude = ['queue_rank']
         read_only_fields = ['created_user']
 
+    def validate(self, attrs):
+        return resolve_assignment(attrs)
+
     def update(self, instance, validated_data):
         request = self.context['request']
 
@@ -16,9 +42,109 @@ class TicketSerializer(serializers.ModelSerializer):
                 "Resolved tickets cannot be edited."
             )
 
-        if 'assigned_to' in validated_data and not request.user.is_staff:
+        if not request.user.is_staff and (
+            'assigned_to' in validated_data or 'assignee' in validated_data
+        ):
             raise serializers.ValidationError(
                 "Only admins can assign tickets."
             )
 
         return super().update(instance, validated_data)
+
+
+class TicketBulkActionSerializer(serializers.Serializer):
+    """Validates a bulk assign, re-prioritise or resolve request."""
+
+    ACTIONS = ['assign', 'prioritize', 'resolve']
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_TICKETS
+    )
+    action = serializers.ChoiceField(choices=ACTIONS)
+    assigned_to = serializers.CharField(required=False, max_length=255)
+    assignee = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(is_staff=True), required=False
+    )
+    priority = serializers.ChoiceField(
+        choices=PRIORITY_CHOICES, required=False
+    )
+
+    def validate(self, attrs):
+        if attrs['action'] == 'assign' and not (
+            attrs.get('assigned_to') or attrs.get('assignee')
+        ):
+            raise serializers.ValidationError(
+                {'assigned_to': 'This field is required to assign tickets.'}
+            )
+        if attrs['action'] == 'prioritize' and not attrs.get('priority'):
+            raise serializers.ValidationError(
+                {'priority': 'This field is required to change priority.'}
+            )
+        if attrs['action'] == 'assign':
+            resolve_assignment(attrs)
+        return attrs
+
+
+class ValuesPlan:
+    """
+    Read-only field plan rendering ``values_list`` rows exactly as
+    ``serializer_class`` renders model instances.
+
+    The plan is compiled once per serializer: one column per readable
+    field, in output order, and a converter only for the fields whose
+    representation differs from the database value. Rows are tuples, so
+    listing skips model instantiation and DRF's per-field attribute
+    lookups. Only fields backed directly by a concrete model field are
+    supported.
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.keys = []
+        self.columns = []
+        self.converters = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or not model_field.concrete or (
+                isinstance(field, serializers.PrimaryKeyRelatedField) and
+                field.pk_field is not None
+            ):
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{name} cannot be '
+                    f'rendered from a values() row.'
+                )
+            self.keys.append(name)
+            self.columns.append('pk' if model_field.primary_key else
+                                model_field.name)
+            self.converters.append(
+                None if isinstance(field, PASSTHROUGH_FIELDS)
+                else field.to_representation
+            )
+
+    def rows(self, queryset):
+        # Named rows keep ``row.pk`` and the ordering fields readable for
+        # keyset pagination.
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, row):
+        return {
+            key: value if value is None or convert is None
+            else convert(value)
+            for key, convert, value in zip(self.keys, self.converters, row)
+        }
+
+    def render(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+@cache
+def get_values_plan(serializer_class):
+    return ValuesPlan(serializer_class)
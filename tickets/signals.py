@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from ticsol.cache import ticket_stats_cache, user_ticket_stats_cache
+from .events import EVENT_FIELDS, make_event, ticket_events
+from .models import ArchivedTicket, Ticket, TicketCreationRollup
+from . import stats
+
+# Sent inside the transaction of set-based updates that bypass
+# ``Ticket.save()``, with ``changes`` as a list of ``(before, after)`` dicts
+# holding at least the ``id``, tracked fields and ``created_user_id`` of each
+# ticket, and ``using`` as the database written to.
+tickets_bulk_updated = Signal()
+
+# Sent inside the transaction that moves tickets to the archive table, with
+# ``tickets`` as a list of dicts holding the ``ArchivedTicket.COPIED_FIELDS``
+# of each ticket and ``using`` as the database written to. The tickets leave
+# the tickets table without a delete signal, and the creation rollup keeps
+# counting them.
+tickets_archived = Signal()
+
+
+@receiver(post_save, sender=Ticket)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    before = None if created else getattr(instance, '_loaded_state', None)
+    after = instance.tracked_state()
+    if before:
+        # Deferred fields that were never loaded cannot have changed.
+        known = [
+            field for field in after
+            if before.get(field) is not None and after[field] is not None
+        ]
+        before = {field: before[field] for field in known}
+        after = {field: after[field] for field in known}
+    stats.record_change(before, after)
+    if before is None or 'status' in before:
+        stats.record_user_changes([(
+            instance.created_user_id,
+            before and before['status'],
+            after['status']
+        )])
+
+
+@receiver(post_delete, sender=Ticket)
+def update_stats_on_delete(sender, instance, **kwargs):
+    before = getattr(instance, '_loaded_state', None)
+    before = before or instance.tracked_state()
+    stats.record_change(before, None)
+    if before.get('status') is not None:
+        stats.record_user_changes([
+            (instance.created_user_id, before['status'], None)
+        ])
+
+
+@receiver(post_save, sender=Ticket)
+def update_creation_rollup_on_save(sender, instance, created, **kwargs):
+    if created:
+        TicketCreationRollup.add(instance.created_at, 1)
+
+
+@receiver(post_delete, sender=Ticket)
+def update_creation_rollup_on_delete(sender, instance, **kwargs):
+    TicketCreationRollup.add(instance.created_at, -1)
+
+
+@receiver(tickets_bulk_updated)
+def update_stats_on_bulk_update(sender, changes, **kwargs):
+    stats.record_changes(changes)
+    stats.record_user_changes(
+        (before['created_user_id'], before['status'], after['status'])
+        for before, after in changes
+    )
+
+
+@receiver(tickets_archived)
+def update_stats_on_archive(sender, tickets, **kwargs):
+    stats.record_changes((ticket, None) for ticket in tickets)
+    stats.record_user_changes(
+        (ticket['created_user_id'], ticket['status'], None)
+        for ticket in tickets
+    )
+
+
+@receiver(post_delete, sender=ArchivedTicket)
+def update_creation_rollup_on_archived_delete(sender, instance, **kwargs):
+    TicketCreationRollup.add(instance.created_at, -1)
+
+
+def invalidate_stats_caches(user_ids, using=None):
+    """Bump the stats cache versions once the write has committed."""
+    def bump():
+        ticket_stats_cache.bump()
+        for user_id in set(user_ids):
+            user_ticket_stats_cache.bump(user_id)
+    transaction.on_commit(bump, using=using)
+
+
+@receiver(post_save, sender=Ticket)
+def invalidate_stats_on_save(sender, instance, using, **kwargs):
+    invalidate_stats_caches([instance.created_user_id], using=using)
+
+
+@receiver(post_delete, sender=Ticket)
+def invalidate_stats_on_delete(sender, instance, using, **kwargs):
+    invalidate_stats_caches([instance.created_user_id], using=using)
+
+
+@receiver(tickets_bulk_updated)
+def invalidate_stats_on_bulk_update(sender, changes, using=None, **kwargs):
+    invalidate_stats_caches(
+        [before['created_user_id'] for before, _ in changes], using=using
+    )
+
+
+@receiver(tickets_archived)
+def invalidate_stats_on_archive(sender, tickets, using=None, **kwargs):
+    invalidate_stats_caches(
+        [ticket['created_user_id'] for ticket in tickets], using=using
+    )
+
+
+@receiver(post_delete, sender=ArchivedTicket)
+def invalidate_stats_on_archived_delete(sender, instance, using, **kwargs):
+    invalidate_stats_caches([instance.created_user_id], using=using)
+
+
+def event_state(instance):
+    # Deferred fields are left out rather than loaded.
+    return {field: instance.__dict__.get(field) for field in EVENT_FIELDS}
+
+
+@receiver(post_save, sender=Ticket)
+def publish_event_on_save(sender, instance, created, using, **kwargs):
+    before = None if created else (
+        getattr(instance, '_loaded_state', None) or {}
+    )
+    ticket_events.publish([make_event(
+        instance.pk, instance.created_user_id, before, event_state(instance)
+    )], using=using)
+
+
+@receiver(post_delete, sender=Ticket)
+def publish_event_on_delete(sender, instance, using, **kwargs):
+    ticket_events.publish([make_event(
+        instance.pk, instance.created_user_id, event_state(instance), None
+    )], using=using)
+
+
+@receiver(tickets_bulk_updated)
+def publish_events_on_bulk_update(sender, changes, using=None, **kwargs):
+    ticket_events.publish((
+        make_event(before['id'], before['created_user_id'], before, after)
+        for before, after in changes
+    ), using=using)
+
+
+@receiver(tickets_archived)
+def publish_events_on_archive(sender, tickets, using=None, **kwargs):
+    ticket_events.publish((
+        make_event(
+            ticket['id'], ticket['created_user_id'], ticket, None,
+            kind='archived'
+        )
+        for ticket in tickets
+    ), using=using)
@@ -0,0 +1,372 @@
+from collections import Counter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from .models import (
+    ArchivedTicket, Ticket, TicketCreationRollup, TicketStatsCounter,
+    UserTicketCounter, PRIORITY_CHOICES, STATUS_CHOICES
+)
+
+COUNTED_FIELDS = {
+    'status': [value for value, _ in STATUS_CHOICES],
+    'priority': [value for value, _ in PRIORITY_CHOICES],
+}
+
+
+def counters_enabled():
+    return getattr(settings, 'TICKET_STATS_COUNTERS', True)
+
+
+def empty_counts():
+    counts = {
+        field: dict.fromkeys(values, 0)
+        for field, values in COUNTED_FIELDS.items()
+    }
+    counts['total'] = 0
+    return counts
+
+
+def get_ticket_counts():
+    """
+    Return total, per-status and per-priority ticket counts.
+
+    Reads the maintained counter rows when counters are enabled, otherwise
+    computes everything with a single conditional-aggregation query.
+    """
+    if not counters_enabled():
+        return aggregate_ticket_counts(Ticket.objects.all())
+
+    counts = empty_counts()
+    rows = TicketStatsCounter.objects.values_list('field', 'value', 'count')
+    for field, value, count in rows:
+        if field in counts:
+            counts[field][value] = count
+    counts['total'] = sum(counts['status'].values())
+    return counts
+
+
+def aggregate_ticket_counts(queryset):
+    aggregates = {'total': Count('id')}
+    for field, values in COUNTED_FIELDS.items():
+        for value in values:
+            aggregates[_alias(field, value)] = Count(
+                'id', filter=Q(**{field: value})
+            )
+
+    result = queryset.order_by().aggregate(**aggregates)
+
+    counts = empty_counts()
+    counts['total'] = result['total']
+    for field, values in COUNTED_FIELDS.items():
+        for value in values:
+            counts[field][value] = result[_alias(field, value)]
+    return counts
+
+
+def archived_ticket_counts():
+    """
+    Counts of the archived tickets, aggregated from the archive table: it
+    only changes when tickets are archived, so the result is cached with
+    the rest of the dashboard.
+    """
+    return aggregate_ticket_counts(ArchivedTicket.objects.all())
+
+
+def add_ticket_counts(counts, more):
+    """Sum two ``get_ticket_counts`` results."""
+    total = empty_counts()
+    total['total'] = counts['total'] + more['total']
+    for field, values in COUNTED_FIELDS.items():
+        for value in values:
+            total[field][value] = counts[field][value] + more[field][value]
+    return total
+
+
+def ticket_creation_by_month(year):
+    return TicketCreationRollup.by_month(year)
+
+
+def ticket_creation_series(series_range):
+    return TicketCreationRollup.series(*series_range)
+
+
+def rebuild_ticket_creation_rollup():
+    """Rebuild the creation rollup, which counts archived tickets too."""
+    return TicketCreationRollup.rebuild(
+        'created_at', Ticket.objects.all(), ArchivedTicket.objects.all()
+    )
+
+
+def recent_tickets(limit=5):
+    return [
+        {
+            'id': ticket.id,
+            'title': ticket.title,
+            'priority': ticket.priority,
+            'status': ticket.status,
+            'createdAt': ticket.created_at.strftime('%Y-%m-%d'),
+            'assignedTo': ticket.assigned_to
+        }
+        for ticket in Ticket.objects.all().order_by('-created_at')[:limit]
+    ]
+
+
+def user_ticket_status_counts(user_id, model=Ticket):
+    return model.objects.filter(
+        created_user_id=user_id
+    ).values('status').annotate(
+        count=Count('id')
+    ).order_by()
+
+
+def aggregate_user_ticket_counts(user_id, model=Ticket):
+    counts = dict.fromkeys(COUNTED_FIELDS['status'], 0)
+    for item in user_ticket_status_counts(user_id, model):
+        counts[item['status']] = item['count']
+    return counts
+
+
+def archived_user_ticket_counts(user_id):
+    return aggregate_user_ticket_counts(user_id, ArchivedTicket)
+
+
+def add_user_ticket_counts(counts, more):
+    return {status: counts[status] + more[status] for status in counts}
+
+
+def user_counter_row(user_id):
+    return UserTicketCounter.objects.filter(user_id=user_id).values_list(
+        *UserTicketCounter.STATUS_COLUMNS.values()
+    )
+
+
+def user_counter_counts(row):
+    return dict(zip(UserTicketCounter.STATUS_COLUMNS, row or (0, 0, 0)))
+
+
+def user_ticket_counts(user_id):
+    """
+    Per-status counts of the user's tickets: a primary key lookup of the
+    user's counter row when counters are enabled.
+    """
+    if not counters_enabled():
+        return aggregate_user_ticket_counts(user_id)
+    return user_counter_counts(user_counter_row(user_id).first())
+
+
+async def auser_ticket_counts(user_id):
+    """Async ``user_ticket_counts``."""
+    if not counters_enabled():
+        return await sync_to_async(aggregate_user_ticket_counts)(user_id)
+    return user_counter_counts(await user_counter_row(user_id).afirst())
+
+
+def build_ticket_dashboard(counts, creation_by_month, recent,
+                           creation_series=None):
+    open_tickets = counts['status']['open']
+    in_progress_tickets = counts['status']['in-progress']
+    resolved_tickets = counts['status']['resolved']
+
+    dashboard = {
+        'totalTickets': counts['total'],
+        'openTickets': open_tickets,
+        'inProgressTickets': in_progress_tickets,
+        'resolvedTickets': resolved_tickets,
+        'ticketsByPriority': counts['priority'],
+        'ticketCreationByMonth': creation_by_month,
+        'ticketsByStatus': [
+            open_tickets, in_progress_tickets, resolved_tickets
+        ],
+        'recentTickets': recent
+    }
+    if creation_series is not None:
+        dashboard['ticketCreationSeries'] = creation_series
+    return dashboard
+
+
+def build_user_ticket_dashboard(counts):
+    return {
+        'totalTickets': sum(counts.values()),
+        'openTickets': counts['open'],
+        'inProgressTickets': counts['in-progress'],
+        'resolvedTickets': counts['resolved']
+    }
+
+
+def record_change(before, after):
+    """
+    Apply the counter deltas for a ticket moving from ``before`` to
+    ``after``. Either state may be ``None`` for a create or a delete.
+    """
+    record_changes([(before, after)])
+
+
+def record_changes(changes):
+    """Apply the summed counter deltas of many ``(before, after)`` pairs."""
+    if not counters_enabled():
+        return
+
+    deltas = Counter()
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if not state:
+                continue
+            for field in COUNTED_FIELDS:
+                value = state.get(field)
+                if value is not None:
+                    deltas[(field, value)] += sign
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    # Rows are always touched in the same order so that concurrent
+    # transactions cannot deadlock on each other's counter locks.
+    for (field, value), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        updated = TicketStatsCounter.objects.filter(
+            field=field, value=value
+        ).update(count=F('count') + delta)
+        if not updated:
+            TicketStatsCounter.objects.get_or_create(field=field, value=value)
+            TicketStatsCounter.objects.filter(
+                field=field, value=value
+            ).update(count=F('count') + delta)
+
+
+def record_user_changes(changes):
+    """
+    Apply the per-user status deltas of ``(user_id, before, after)``
+    triples, where ``before`` and ``after`` are statuses and ``before`` is
+    ``None`` for a new ticket and ``after`` ``None`` for a deleted one.
+    """
+    if not counters_enabled():
+        return
+
+    deltas = {}
+    creators = set()
+    for user_id, before, after in changes:
+        if before == after:
+            continue
+        user_deltas = deltas.setdefault(user_id, Counter())
+        if before is None:
+            creators.add(user_id)
+        else:
+            user_deltas[before] -= 1
+        if after is not None:
+            user_deltas[after] += 1
+
+    # Same ordering rule as ``apply_deltas``, by user.
+    for user_id, user_deltas in sorted(deltas.items()):
+        updates = {
+            UserTicketCounter.STATUS_COLUMNS[status]: F(
+                UserTicketCounter.STATUS_COLUMNS[status]
+            ) + delta
+            for status, delta in user_deltas.items() if delta
+        }
+        if not updates:
+            continue
+        counters = UserTicketCounter.objects.filter(user_id=user_id)
+        if not counters.update(**updates) and user_id in creators:
+            # Only a new ticket starts a counter. Other changes to a missing
+            # counter are drift for the reconcile command, and a cascade
+            # from a user being deleted must not recreate it.
+            UserTicketCounter.objects.get_or_create(user_id=user_id)
+            counters.update(**updates)
+
+
+def reconcile_counters():
+    """
+    Rewrite the counter rows from the ticket table.
+
+    Returns a list of ``(field, value, stored, actual)`` tuples for every
+    counter that had drifted.
+    """
+    drift = []
+    with transaction.atomic():
+        # Locking the counters first makes concurrent saves queue behind
+        # the rewrite and apply their deltas on top of the fresh values.
+        stored = {
+            (counter.field, counter.value): counter
+            for counter in TicketStatsCounter.objects.select_for_update()
+        }
+        actual = aggregate_ticket_counts(Ticket.objects.all())
+
+        for field, values in COUNTED_FIELDS.items():
+            for value in values:
+                count = actual[field][value]
+                counter = stored.pop((field, value), None)
+                if counter is None:
+                    TicketStatsCounter.objects.create(
+                        field=field, value=value, count=count
+                    )
+                    drift.append((field, value, None, count))
+                elif counter.count != count:
+                    drift.append((field, value, counter.count, count))
+                    counter.count = count
+                    counter.save(update_fields=['count'])
+
+        for (field, value), counter in stored.items():
+            drift.append((field, value, counter.count, None))
+            counter.delete()
+
+    return drift
+
+
+def reconcile_user_counters():
+    """
+    Rewrite the per-user counters from the ticket table.
+
+    Returns a list of ``(user_id, stored, actual)`` tuples, each a dict of
+    status counts or ``None``, for every counter that had drifted.
+    """
+    columns = UserTicketCounter.STATUS_COLUMNS
+    drift = []
+    with transaction.atomic():
+        stored = {
+            counter.user_id: counter
+            for counter in UserTicketCounter.objects.select_for_update()
+        }
+        actual = {}
+        rows = Ticket.objects.values('created_user_id', 'status').annotate(
+            count=Count('id')
+        ).order_by()
+        for row in rows:
+            counts = actual.setdefault(
+                row['created_user_id'], dict.fromkeys(columns, 0)
+            )
+            counts[row['status']] = row['count']
+
+        for user_id, counts in sorted(actual.items()):
+            counter = stored.pop(user_id, None)
+            if counter is None:
+                UserTicketCounter.objects.create(user_id=user_id, **{
+                    columns[status]: count for status, count in counts.items()
+                })
+                drift.append((user_id, None, counts))
+                continue
+            current = {
+                status: getattr(counter, column)
+                for status, column in columns.items()
+            }
+            if current != counts:
+                drift.append((user_id, current, counts))
+                for status, column in columns.items():
+                    setattr(counter, column, counts[status])
+                counter.save()
+
+        for user_id, counter in sorted(stored.items()):
+            current = {
+                status: getattr(counter, column)
+                for status, column in columns.items()
+            }
+            if any(current.values()):
+                drift.append((user_id, current, None))
+            counter.delete()
+
+    return drift
+
+
+def _alias(field, value):
+    return f'{field}_{value}'.replace('-', '_')
@@ -1,3 +1,1715 @@
-from django.test import TestCase
+import csv
+import json
+import random
+import threading
+import time
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import partial
+from unittest import mock
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import (
+    DatabaseError, connection, connections, router, transaction
+)
+from django.http import StreamingHttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import (
+    APIClient, APIRequestFactory, force_authenticate
+)
+from rest_framework.throttling import BaseThrottle
+from accounts.models import User
+from accounts.tokens import UserStateRefreshToken
+from ticsol.admin import EstimatedCountPaginator
+from ticsol.cache import VersionedCache
+from ticsol.concurrency import run_concurrently
+from ticsol.db_routers import is_pinned
+from ticsol.middleware import QueryInstrumentationMiddleware
+from . import views
+from .archive import archive_batch, archive_cutoff
+from .bulk import apply_bulk_action
+from .events import (
+    LocalEventBackend, can_see, make_event, ticket_events
+)
+from .models import (
+    ArchivedTicket, Ticket, TicketCreationRollup, UserTicketCounter,
+    PRIORITY_CHOICES, STATUS_CHOICES, queue_rank
+)
+from .permissions import can_edit, can_view, filter_editable, filter_visible
+from .queue import agent_queue, agent_workloads, find_assignee
+from .serializers import TicketSerializer, get_values_plan
+from .stats import (
+    aggregate_user_ticket_counts, rebuild_ticket_creation_rollup,
+    reconcile_counters, reconcile_user_counters, user_ticket_counts
+)
 
-# Create your tests here.
+
+@override_settings(DATABASE_REPLICAS=[])
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN for every ticket query the hot endpoints issue against a
+    seeded database and fails when one of them falls back to a sequential
+    scan or sorts rows instead of reading them in index order.
+    """
+    USERS = 20
+    TICKETS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        password = make_password('Passw0rd!')
+        cls.users = User.objects.bulk_create(
+            User(email=f'user{i}@example.com', password=password)
+            for i in range(cls.USERS)
+        )
+        cls.admin = User.objects.create_superuser(
+            'admin@example.com', 'Passw0rd!'
+        )
+        agents = [cls.admin, None, None]
+        tickets = []
+        for i in range(cls.TICKETS):
+            status = rng.choice(STATUS_CHOICES)[0]
+            priority = rng.choice(PRIORITY_CHOICES)[0]
+            tickets.append(Ticket(
+                title=f'Ticket {i}',
+                description='Seeded for query plan checks',
+                created_user=rng.choice(cls.users),
+                status=status,
+                priority=priority,
+                assignee=rng.choice(agents),
+                queue_rank=queue_rank(status, priority),
+            ))
+        Ticket.objects.bulk_create(tickets)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Only pick a scan or sort when no index can serve the query.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute('EXPLAIN ' + sql)
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def plan_problems(self, plan):
+        problems = []
+        for line in plan:
+            step = line.strip().lstrip('->').strip()
+            if connection.vendor == 'postgresql':
+                if step.startswith('Seq Scan on tickets_ticket'):
+                    problems.append(step)
+                elif step.startswith('Sort'):
+                    problems.append(step)
+            else:
+                if step.startswith('SCAN tickets_ticket') and (
+                    'INDEX' not in step
+                ):
+                    problems.append(step)
+                elif 'TEMP B-TREE FOR ORDER BY' in step:
+                    problems.append(step)
+        return problems
+
+    def assertIndexedQueries(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        ticket_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'tickets_ticket"' in query['sql']
+        ]
+        self.assertTrue(ticket_queries, f'{url} issued no ticket queries')
+        for sql in ticket_queries:
+            plan = self.explain(sql)
+            self.assertEqual(
+                self.plan_problems(plan), [],
+                f'{url}\n{sql}\n' + '\n'.join(plan)
+            )
+
+    def test_owner_list(self):
+        user = self.users[0]
+        self.assertIndexedQueries(user, '/tickets/')
+        self.assertIndexedQueries(user, '/tickets/?status=open')
+        self.assertIndexedQueries(user, '/tickets/?priority=high')
+        self.assertIndexedQueries(user, '/tickets/?pagination=cursor')
+        self.assertIndexedQueries(user, '/tickets/?include_archived=1')
+
+    def test_staff_list(self):
+        self.assertIndexedQueries(self.admin, '/tickets/')
+        self.assertIndexedQueries(self.admin, '/tickets/?status=resolved')
+        self.assertIndexedQueries(self.admin, '/tickets/?priority=low')
+        self.assertIndexedQueries(
+            self.admin, '/tickets/?pagination=cursor&status=open'
+        )
+
+    def test_detail(self):
+        ticket = Ticket.objects.filter(created_user=self.users[0]).first()
+        self.assertIndexedQueries(self.users[0], f'/tickets/{ticket.pk}/')
+
+    def test_stats(self):
+        self.assertIndexedQueries(self.admin, '/tickets/stats/')
+
+    def test_work_queue(self):
+        self.assertIndexedQueries(
+            self.admin, f'/tickets/queue/?assignee={self.admin.pk}'
+        )
+        self.assertIndexedQueries(self.admin, '/tickets/workload/')
+
+    @override_settings(TICKET_STATS_COUNTERS=False)
+    def test_user_stats_without_counters(self):
+        self.assertIndexedQueries(self.users[0], '/tickets/user-stats/')
+
+
+@override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1)
+class QueryInstrumentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'Passw0rd!')
+        cls.admin = User.objects.create_superuser(
+            'admin@example.com', 'Passw0rd!'
+        )
+
+    def test_timing_header_is_only_sent_to_staff(self):
+        client = APIClient()
+        for user, debug, expected in [
+            (self.user, False, False),
+            (self.admin, False, True),
+            (self.user, True, True),
+        ]:
+            client.force_authenticate(user)
+            with self.assertLogs('ticsol.sql', 'INFO') as logs, \
+                    override_settings(DEBUG=debug):
+                response = client.get('/tickets/')
+            self.assertEqual(response.has_header('Server-Timing'), expected)
+            record = logs.records[0].sql_stats
+            self.assertEqual(record['path'], '/tickets/')
+            self.assertGreater(record['queries'], 0)
+
+    def streamed_content(self):
+        yield b'['
+        yield str(User.objects.count()).encode()
+        yield b']'
+
+    def test_streamed_queries_are_recorded(self):
+        middleware = QueryInstrumentationMiddleware(
+            lambda request: StreamingHttpResponse(self.streamed_content())
+        )
+        with self.assertNoLogs('ticsol.sql'):
+            response = middleware(RequestFactory().get('/stream/'))
+        with self.assertLogs('ticsol.sql', 'INFO') as logs:
+            self.assertEqual(b''.join(response), b'[2]')
+        self.assertEqual(logs.records[0].sql_stats['queries'], 1)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    async def test_async_streamed_queries_are_recorded(self):
+        async def content():
+            yield b'['
+            yield str(await User.objects.acount()).encode()
+            yield b']'
+
+        async def get_response(request):
+            return StreamingHttpResponse(content())
+
+        middleware = QueryInstrumentationMiddleware(get_response)
+        response = await middleware(RequestFactory().get('/stream/'))
+        with self.assertLogs('ticsol.sql', 'INFO') as logs:
+            self.assertEqual(
+                b''.join([chunk async for chunk in response]), b'[2]'
+            )
+        self.assertEqual(logs.records[0].sql_stats['queries'], 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], CACHE_SHARED=True)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Checks which requests read from a replica, against the ``replica1``
+    test mirror of the primary. The mirror is a second connection, so the
+    data has to be committed for it to see.
+    """
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('user@example.com', 'Passw0rd!')
+        self.admin = User.objects.create_superuser(
+            'admin@example.com', 'Passw0rd!'
+        )
+        Ticket.objects.create(
+            title='Printer', description='Jammed', created_user=self.user
+        )
+        # Keep run_concurrently() on this thread, whose connections the
+        # tests capture.
+        patcher = mock.patch(
+            'ticsol.concurrency._in_transaction', return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, user, method, url, data=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = getattr(client, method)(url, data)
+        return (
+            response,
+            [query['sql'] for query in primary.captured_queries],
+            [query['sql'] for query in replica.captured_queries],
+        )
+
+    def test_safe_requests_read_from_replica(self):
+        for user, url in [
+            (self.user, '/tickets/'),
+            (self.admin, '/tickets/'),
+            (self.admin, '/auth/users/'),
+        ]:
+            response, primary, replica = self.request(user, 'get', url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(primary, [], url)
+            self.assertTrue(replica, url)
+        self.assertEqual(router.db_for_read(Ticket), 'default')
+
+    def test_cached_stats_are_computed_on_primary(self):
+        for user, url in [
+            (self.user, '/tickets/user-stats/'),
+            (self.admin, '/tickets/stats/'),
+            (self.admin, '/auth/users/stats/'),
+        ]:
+            response, primary, replica = self.request(user, 'get', url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(primary, url)
+            self.assertEqual(replica, [], url)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_no_replica_reads_without_shared_cache(self):
+        response, primary, replica = self.request(
+            self.admin, 'get', '/tickets/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_writes_use_primary_and_pin_the_user(self):
+        response, primary, replica = self.request(
+            self.user, 'post', '/tickets/',
+            {'title': 'VPN', 'description': 'Down'}
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(any(sql.startswith('INSERT') for sql in primary))
+        self.assertEqual(replica, [])
+        self.assertTrue(is_pinned(self.user.pk))
+
+        # The user reads their own write from the primary.
+        response, primary, replica = self.request(
+            self.user, 'get', '/tickets/'
+        )
+        self.assertEqual(response.data['count'], 2)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+        response, primary, replica = self.request(
+            self.admin, 'get', '/tickets/'
+        )
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_failed_writes_do_not_pin(self):
+        response, _, _ = self.request(self.user, 'post', '/tickets/', {})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(is_pinned(self.user.pk))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate('replica1', 'tickets'))
+        self.assertTrue(router.allow_migrate('default', 'tickets'))
+        self.assertEqual(router.db_for_write(Ticket), 'default')
+
+
+class ValuesPlanTests(TestCase):
+    """The values plan must render tickets exactly like the serializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'Passw0rd!')
+        Ticket.objects.create(
+            title='Printer "jammed"', description='Ünïcode\nlines',
+            created_user=cls.user
+        )
+        Ticket.objects.create(
+            title='VPN', description='Down', priority='high',
+            status='in-progress', assigned_to='alice', created_user=cls.user
+        )
+
+    def test_rows_render_like_serializer(self):
+        plan = get_values_plan(TicketSerializer)
+        queryset = Ticket.objects.order_by('-created_at', '-id')
+        render = JSONRenderer().render
+        self.assertEqual(
+            render(plan.render(plan.rows(queryset))),
+            render(TicketSerializer(queryset, many=True).data)
+        )
+
+    def test_list_uses_plan_output(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/tickets/')
+        self.assertEqual(
+            response.data['results'],
+            TicketSerializer(
+                Ticket.objects.order_by('-created_at', '-id'), many=True
+            ).data
+        )
+
+
+class StatsRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_tickets(self, *days):
+        tickets = []
+        for day in days:
+            ticket = Ticket.objects.create(
+                title='Ticket', description='Text', created_user=self.admin
+            )
+            Ticket.objects.filter(pk=ticket.pk).update(
+                created_at=timezone.make_aware(datetime.combine(
+                    day, datetime.min.time().replace(hour=12)
+                ))
+            )
+            tickets.append(ticket)
+        return tickets
+
+    def test_rollup_follows_creates_and_deletes(self):
+        first, _ = self.create_tickets(date.today(), date.today())
+        today = timezone.localdate()
+        self.assertEqual(
+            TicketCreationRollup.objects.get(day=today).count, 2
+        )
+        first.delete()
+        self.assertEqual(
+            TicketCreationRollup.objects.get(day=today).count, 1
+        )
+
+    def test_series(self):
+        self.create_tickets(
+            date(2024, 1, 1), date(2024, 1, 31), date(2024, 3, 4),
+            date(2024, 3, 10), date(2025, 1, 1)
+        )
+        self.assertEqual(rebuild_ticket_creation_rollup(), 5)
+
+        response = self.client.get(
+            '/tickets/stats/?from=2024-01-01&to=2024-03-31'
+            '&granularity=month'
+        )
+        self.assertEqual(response.data['ticketCreationSeries'], [
+            {'period': '2024-01-01', 'count': 2},
+            {'period': '2024-02-01', 'count': 0},
+            {'period': '2024-03-01', 'count': 2},
+        ])
+        response = self.client.get(
+            '/tickets/stats/?from=2024-03-01&to=2024-03-12&granularity=week'
+        )
+        self.assertEqual(response.data['ticketCreationSeries'], [
+            {'period': '2024-02-26', 'count': 0},
+            {'period': '2024-03-04', 'count': 2},
+            {'period': '2024-03-11', 'count': 0},
+        ])
+        self.assertNotIn(
+            'ticketCreationSeries', self.client.get('/tickets/stats/').data
+        )
+
+    def test_invalid_range(self):
+        for query in ('granularity=year', 'from=2024-13-01',
+                      'from=2024-02-01&to=2024-01-01'):
+            response = self.client.get(f'/tickets/stats/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+@override_settings(CACHE_SHARED=True)
+class StatsCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'Passw0rd!')
+
+    def setUp(self):
+        cache.clear()
+        self.cache = VersionedCache('test-stats')
+        self.compute = mock.Mock(side_effect=range(100))
+
+    def test_values_are_cached_per_version_and_scope(self):
+        get = self.cache.get_or_set
+        self.assertEqual(get('counts', self.compute), 0)
+        self.assertEqual(get('counts', self.compute), 0)
+        self.assertEqual(get('counts', self.compute, scope=1), 1)
+        self.assertEqual(get('counts', self.compute, scope=2), 2)
+        self.assertEqual(self.compute.call_count, 3)
+        self.assertEqual(self.cache.metrics(), {
+            'hits': 1, 'misses': 3, 'hit_ratio': 0.25
+        })
+
+        self.cache.bump(scope=1)
+        self.assertEqual(get('counts', self.compute, scope=1), 3)
+        self.assertEqual(get('counts', self.compute, scope=2), 2)
+        self.assertEqual(get('counts', self.compute), 0)
+        self.cache.bump()
+        self.assertEqual(get('counts', self.compute), 4)
+
+        # An evicted version key restarts above every earlier version.
+        cache.delete(self.cache.version_key())
+        self.assertEqual(get('counts', self.compute), 5)
+
+    async def test_async_values_are_cached(self):
+        async def compute():
+            return self.compute()
+
+        get = self.cache.aget_or_set
+        self.assertEqual(await get('counts', compute), 0)
+        self.assertEqual(await get('counts', compute), 0)
+        await sync_to_async(self.cache.bump)()
+        self.assertEqual(await get('counts', compute), 1)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_nothing_is_cached_without_a_shared_cache(self):
+        self.assertEqual(self.cache.get_or_set('counts', self.compute), 0)
+        self.assertEqual(self.cache.get_or_set('counts', self.compute), 1)
+
+    def test_writes_invalidate_after_commit(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def open_tickets():
+            return client.get('/tickets/user-stats/').data['openTickets']
+
+        self.assertEqual(open_tickets(), 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            ticket = Ticket.objects.create(
+                title='Printer', description='Jammed', created_user=self.user
+            )
+            self.assertEqual(open_tickets(), 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(open_tickets(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_bulk_action(self.user, [ticket.pk], 'resolve')
+        self.assertEqual(open_tickets(), 0)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        now = timezone.now()
+        for i in range(7):
+            for user in (cls.owner, cls.other):
+                ticket = Ticket.objects.create(
+                    title=f'Ticket {i}', description='Broken',
+                    created_user=user
+                )
+                # Pairs of tickets share a timestamp, so ties are broken
+                # by id.
+                Ticket.objects.filter(pk=ticket.pk).update(
+                    created_at=now - timedelta(hours=i // 2)
+                )
+        cls.expected = list(
+            Ticket.objects.filter(created_user=cls.owner).order_by(
+                '-created_at', '-id'
+            ).values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def ids(self, response):
+        return [ticket['id'] for ticket in response.data['results']]
+
+    def test_pages_follow_cursors_both_ways(self):
+        url = '/tickets/?pagination=cursor&page_size=3'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append((self.ids(response), response.data['previous']))
+            url = response.data['next']
+        self.assertEqual([len(ids) for ids, _ in pages], [3, 3, 1])
+        self.assertEqual(sum((ids for ids, _ in pages), []), self.expected)
+        self.assertIsNone(pages[0][1])
+
+        response = self.client.get(pages[-1][1])
+        self.assertEqual(self.ids(response), pages[1][0])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.ids(response), pages[0][0])
+        self.assertIsNone(response.data['previous'])
+
+    def test_page_size_and_invalid_cursors(self):
+        for page_size, expected in [('2', 2), ('0', 7), ('x', 7), ('80', 7)]:
+            response = self.client.get(
+                f'/tickets/?pagination=cursor&page_size={page_size}'
+            )
+            self.assertEqual(len(response.data['results']), expected)
+
+        for cursor in ('junk', 'MnwyMDI2LTAxLTAxfDE='):
+            response = self.client.get(f'/tickets/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class TicketSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        cls.title_match = Ticket.objects.create(
+            title='Printer jammed', description='Paper stuck',
+            created_user=cls.owner
+        )
+        cls.description_match = Ticket.objects.create(
+            title='Office', description='The printer is offline',
+            created_user=cls.owner
+        )
+        cls.unrelated = Ticket.objects.create(
+            title='VPN', description='Cannot connect', created_user=cls.owner
+        )
+        Ticket.objects.create(
+            title='Printer toner', description='Empty',
+            created_user=cls.other
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def search(self, text):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/tickets/?search={text}')
+        self.assertEqual(response.status_code, 200)
+        ids = [ticket['id'] for ticket in response.data['results']]
+        used_index = any(
+            'tickets_ticket_fts' in query['sql']
+            for query in context.captured_queries
+        )
+        return ids, used_index
+
+    def exported(self, text):
+        response = self.client.get(
+            f'/tickets/export/?file_format=ndjson&search={text}'
+        )
+        return [
+            json.loads(line)['id']
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+
+    def test_ranked_prefix_search_through_the_index(self):
+        for text, expected in [
+            # The newer ticket only mentions it in its description.
+            ('printer', [self.title_match, self.description_match]),
+            ('PRINT', [self.title_match, self.description_match]),
+            ('jam', [self.title_match]),
+            ('printer offline', [self.description_match]),
+            ('the', [self.description_match]),
+            ('toner', []),
+            ('!!', []),
+        ]:
+            ids, used_index = self.search(text)
+            self.assertEqual(ids, [ticket.pk for ticket in expected], text)
+            self.assertEqual(self.exported(text), ids, text)
+            if text != '!!':
+                self.assertTrue(used_index, text)
+
+    def test_icontains_fallback_without_an_index(self):
+        with mock.patch('tickets.search.get_backend', return_value=None):
+            ids, used_index = self.search('print')
+            self.assertFalse(used_index)
+            self.assertEqual(
+                ids, [self.description_match.pk, self.title_match.pk]
+            )
+            self.assertEqual(self.exported('print'), ids)
+            ids, _ = self.search('jammed')
+            self.assertEqual(ids, [self.title_match.pk])
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        cls.ticket = Ticket.objects.create(
+            title='Printer', description='Jammed', created_user=cls.owner
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def revalidate(self, url, etag, user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, context.captured_queries
+
+    def test_detail(self):
+        url = f'/tickets/{self.ticket.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        response, queries = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0]['sql'])
+
+        self.client.patch(url, {'status': 'in-progress'})
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response, _ = self.revalidate(url, etag, user=self.other)
+        self.assertEqual(response.status_code, 404)
+
+    def test_list(self):
+        for url in ('/tickets/', '/tickets/?pagination=cursor'):
+            self.client.force_authenticate(self.owner)
+            etag = self.client.get(url)['ETag']
+            response, _ = self.revalidate(url, etag)
+            self.assertEqual(response.status_code, 304, url)
+
+            response, _ = self.revalidate(url, etag, user=self.other)
+            self.assertEqual(response.status_code, 200, url)
+
+        self.client.force_authenticate(self.owner)
+        etags = [
+            self.client.get(url)['ETag']
+            for url in ('/tickets/', '/tickets/?status=open')
+        ]
+        self.assertNotEqual(*etags)
+        Ticket.objects.create(
+            title='VPN', description='Down', created_user=self.owner
+        )
+        response, _ = self.revalidate('/tickets/', etags[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+        for i, user in enumerate([cls.owner, cls.other] * 3):
+            Ticket.objects.create(
+                title=f'Ticket, "{i}"', description='Line one\nline two',
+                priority='high' if i % 3 else 'low', created_user=user
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        patcher = mock.patch('tickets.views.EXPORT_CHUNK_SIZE', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def export(self, query=''):
+        response = self.client.get(f'/tickets/export/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def listed(self, query=''):
+        separator = '&' if query else '?'
+        return self.client.get(
+            f'/tickets/{query}{separator}page_size=50'
+        ).data['results']
+
+    def test_csv(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="tickets.csv"'
+        )
+        header, *rows = csv.reader(StringIO(content))
+        expected = self.listed()
+        self.assertEqual(header, list(expected[0]))
+        self.assertEqual(rows, [
+            ['' if value is None else str(value) for value in row.values()]
+            for row in expected
+        ])
+
+    def test_ndjson_follows_owner_scope_and_filters(self):
+        for user, query in [
+            (self.owner, ''),
+            (self.other, '?priority=high'),
+            (self.admin, ''),
+            (self.admin, '?priority=low'),
+        ]:
+            self.client.force_authenticate(user)
+            response, content = self.export(
+                f'{query}{"&" if query else "?"}file_format=ndjson'
+            )
+            self.assertEqual(
+                response['Content-Type'], 'application/x-ndjson'
+            )
+            records = [json.loads(line) for line in content.splitlines()]
+            self.assertEqual(
+                records, json.loads(json.dumps(self.listed(query)))
+            )
+        self.assertEqual(len(records), 2)
+
+        self.client.force_authenticate(self.owner)
+        _, content = self.export('?file_format=ndjson')
+        owners = {
+            json.loads(line)['created_user'] for line in content.splitlines()
+        }
+        self.assertEqual(owners, {self.owner.pk})
+
+    def test_unsupported_format(self):
+        response = self.client.get('/tickets/export/?file_format=xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['error'],
+            'Unsupported export format. Use one of: csv, ndjson'
+        )
+
+
+class DenyThrottle(BaseThrottle):
+
+    def allow_request(self, request, view):
+        return False
+
+
+class AsyncViewParityTests(TestCase):
+    """The async read views must answer exactly like the sync ones."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+        cls.tickets = [
+            Ticket.objects.create(
+                title=f'Ticket {i}', description='Broken',
+                created_user=cls.owner if i % 2 else cls.other
+            )
+            for i in range(5)
+        ]
+
+    def get(self, view, path, user=None, **kwargs):
+        cache.clear()
+        request = APIRequestFactory().get(
+            path, HTTP_ACCEPT=kwargs.pop('accept', '*/*')
+        )
+        if user is not None:
+            force_authenticate(request, user)
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+        return view(request, **kwargs).render()
+
+    def assertSameResponse(self, sync_view, async_view, path, user=None,
+                           compare_content=True, **kwargs):
+        expected = self.get(sync_view, path, user, **kwargs)
+        actual = self.get(async_view, path, user, **kwargs)
+        self.assertEqual(actual.status_code, expected.status_code, path)
+        for header in ('Content-Type', 'ETag', 'WWW-Authenticate'):
+            self.assertEqual(
+                actual.get(header), expected.get(header), (path, header)
+            )
+        if compare_content:
+            self.assertEqual(actual.content, expected.content, path)
+        return actual
+
+    def test_ticket_views(self):
+        list_views = (
+            views.TicketViewSet.as_view({'get': 'list'}),
+            views.AsyncTicketListView.as_view()
+        )
+        for user in (self.owner, self.admin, None):
+            for path in ('/tickets/', '/tickets/?page=2&page_size=2',
+                         '/tickets/?page=9', '/tickets/?status=open'):
+                self.assertSameResponse(*list_views, path, user)
+
+        detail_views = (
+            views.TicketViewSet.as_view({'get': 'retrieve'}),
+            views.AsyncTicketDetailView.as_view()
+        )
+        for ticket in self.tickets[:2]:
+            path = f'/tickets/{ticket.pk}/'
+            self.assertSameResponse(*detail_views, path, self.owner,
+                                    pk=ticket.pk)
+
+    def test_stats_views(self):
+        self.assertSameResponse(
+            views.TicketStatsView.as_view(),
+            views.AsyncTicketStatsView.as_view(),
+            '/tickets/stats/', self.admin
+        )
+        self.assertSameResponse(
+            views.TicketStatsView.as_view(),
+            views.AsyncTicketStatsView.as_view(),
+            '/tickets/stats/', self.owner
+        )
+        self.assertSameResponse(
+            views.UserTicketStatsView.as_view(),
+            views.AsyncUserTicketStatsView.as_view(),
+            '/tickets/user-stats/?include_archived=1', self.owner
+        )
+
+    def test_negotiation_and_throttling(self):
+        pair = (
+            views.TicketStatsView.as_view(),
+            views.AsyncTicketStatsView.as_view()
+        )
+        response = self.assertSameResponse(
+            *pair, '/tickets/stats/', self.admin, compare_content=False,
+            accept='text/html'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.assertSameResponse(
+            *pair, '/tickets/stats/', self.admin, accept='application/xml'
+        )
+        self.assertEqual(response.status_code, 406)
+
+        response = self.assertSameResponse(
+            views.TicketStatsView.as_view(throttle_classes=[DenyThrottle]),
+            views.AsyncTicketStatsView.as_view(
+                throttle_classes=[DenyThrottle]
+            ),
+            '/tickets/stats/', self.admin
+        )
+        self.assertEqual(response.status_code, 429)
+
+
+class RunConcurrentlyTests(TransactionTestCase):
+
+    def query(self, value):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT %s', [value])
+            result = cursor.fetchone()[0]
+        return result, threading.current_thread().name, connection.connection
+
+    def test_results_keep_their_order(self):
+        results = async_to_sync(run_concurrently)(
+            *[partial(self.query, value) for value in range(6)]
+        )
+        self.assertEqual([result[0] for result in results], list(range(6)))
+        for _, thread_name, _ in results:
+            self.assertTrue(thread_name.startswith('run-concurrently'))
+
+    def test_worker_connections_are_reused(self):
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(lambda: executor.submit(connections.close_all))
+        run = async_to_sync(run_concurrently)
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0), \
+                mock.patch('ticsol.concurrency._executor', executor):
+            first, = run(partial(self.query, 1))
+            second, = run(partial(self.query, 2))
+        self.assertEqual(first[1], second[1])
+        self.assertIs(first[2], second[2])
+
+    def test_callables_share_the_open_transaction(self):
+        with transaction.atomic():
+            user = User.objects.create_user('user@example.com', 'Passw0rd!')
+            results = async_to_sync(run_concurrently)(
+                User.objects.filter(pk=user.pk).exists,
+                partial(self.query, 1)
+            )
+        self.assertTrue(results[0])
+        self.assertEqual(results[1][1], threading.current_thread().name)
+
+
+class TicketEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+        cls.agent = User.objects.create_superuser(
+            'agent@example.com', 'Passw0rd!'
+        )
+        cls.token = str(
+            UserStateRefreshToken.for_user(cls.owner).access_token
+        )
+
+    def setUp(self):
+        self.backend = LocalEventBackend(3)
+        patcher = mock.patch.object(ticket_events, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def publish(self, owner, status='open'):
+        self.backend.append(make_event(
+            1, owner.pk, {'status': 'open'}, {'status': status}
+        ))
+
+    async def read(self, stream, count):
+        return [await anext(stream) for _ in range(count)]
+
+    def test_signals_publish_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(
+                title='Printer', description='Jammed', created_user=self.owner
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.priority = 'high'
+            ticket.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_bulk_action(self.admin, [ticket.pk], 'resolve')
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.delete()
+
+        # The ring holds the last three of the four events.
+        self.assertIsNone(self.backend.since(0))
+        events = self.backend.since(1)
+        self.assertEqual(
+            [event['type'] for event in events],
+            ['updated', 'resolved', 'deleted']
+        )
+        self.assertEqual(events[0]['ticket']['priority'], 'high')
+        self.assertEqual(events[1]['owner'], self.owner.pk)
+
+    async def test_stream_is_scoped_and_replays(self):
+        self.publish(self.owner)
+        self.publish(self.other, 'resolved')
+        self.publish(self.owner, 'resolved')
+        epoch = self.backend.epoch
+
+        stream = ticket_events.stream(self.owner, last_id=f'{epoch}-0')
+        self.assertEqual(await self.read(stream, 3), [
+            'retry: 15000\n\n',
+            'id: %s-1\nevent: updated\ndata: {"id":1,"created_user":%d,'
+            '"status":"open","priority":null,"assigned_to":null}\n\n'
+            % (epoch, self.owner.pk),
+            'id: %s-3\nevent: resolved\ndata: {"id":1,"created_user":%d,'
+            '"status":"resolved","priority":null,"assigned_to":null}\n\n'
+            % (epoch, self.owner.pk),
+        ])
+        await stream.aclose()
+
+        stream = ticket_events.stream(self.admin, last_id=f'{epoch}-1')
+        chunks = await self.read(stream, 3)
+        self.assertTrue(chunks[1].startswith(f'id: {epoch}-2\n'))
+        self.assertTrue(chunks[2].startswith(f'id: {epoch}-3\n'))
+        await stream.aclose()
+
+        self.publish(self.owner)
+        stream = ticket_events.stream(self.owner, last_id=f'{epoch}-0')
+        chunks = await self.read(stream, 2)
+        self.assertEqual(
+            chunks[1], f'id: {epoch}-4\nevent: reset\ndata: {{}}\n\n'
+        )
+        await stream.aclose()
+
+    async def test_ids_from_another_process_reset(self):
+        self.publish(self.owner)
+        for last_id in ('0123abcd-1', '1', 'junk'):
+            stream = ticket_events.stream(self.owner, last_id=last_id)
+            chunks = await self.read(stream, 2)
+            self.assertEqual(
+                chunks[1],
+                f'id: {self.backend.epoch}-1\nevent: reset\ndata: {{}}\n\n'
+            )
+            await stream.aclose()
+
+    @override_settings(TICKET_EVENTS_HEARTBEAT=0.01)
+    async def test_stream_follows_user_changes(self):
+        staff = self.agent
+        stream = ticket_events.stream(staff)
+        self.assertEqual(await anext(stream), 'retry: 10\n\n')
+        await User.objects.filter(pk=staff.pk).aupdate(is_staff=False)
+        self.assertEqual(await anext(stream), ': keepalive\n\n')
+        self.publish(self.other)
+        self.publish(staff)
+        self.assertTrue((await anext(stream)).startswith(
+            f'id: {self.backend.epoch}-2\n'
+        ))
+
+        await User.objects.filter(pk=staff.pk).aupdate(is_active=False)
+        with self.assertRaises(StopAsyncIteration):
+            await self.read(stream, 2)
+
+    async def test_stream_ends_when_credentials_expire(self):
+        stream = ticket_events.stream(
+            self.owner, expires_at=time.time() - 1
+        )
+        await anext(stream)
+        self.publish(self.owner)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    async def test_endpoint_streams_new_events(self):
+        response = await self.async_client.get(
+            '/tickets/events/',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 15000\n\n')
+        self.publish(self.other)
+        self.publish(self.owner)
+        self.assertTrue((await anext(stream)).startswith(
+            f'id: {self.backend.epoch}-2\n'.encode()
+        ))
+        await stream.aclose()
+
+
+class UserTicketCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user@example.com', 'Passw0rd!')
+
+    def assertCountsMatch(self, expected):
+        self.assertEqual(user_ticket_counts(self.user.pk), expected)
+        self.assertEqual(aggregate_user_ticket_counts(self.user.pk), expected)
+
+    def test_counters_follow_ticket_changes(self):
+        first = Ticket.objects.create(
+            title='Printer', description='Jammed', created_user=self.user
+        )
+        second = Ticket.objects.create(
+            title='VPN', description='Down', created_user=self.user
+        )
+        self.assertCountsMatch({'open': 2, 'in-progress': 0, 'resolved': 0})
+
+        # Assigning moves an open ticket to in-progress in Ticket.save.
+        first.assigned_to = 'alice'
+        first.save()
+        apply_bulk_action(self.user, [second.pk], 'resolve')
+        self.assertCountsMatch({'open': 0, 'in-progress': 1, 'resolved': 1})
+
+        Ticket.objects.get(pk=first.pk).delete()
+        self.assertCountsMatch({'open': 0, 'in-progress': 0, 'resolved': 1})
+
+        self.user.delete()
+        self.assertFalse(UserTicketCounter.objects.exists())
+
+    def test_stale_instances_do_not_skew_counters(self):
+        ticket = Ticket.objects.create(
+            title='Printer', description='Jammed', priority='low',
+            created_user=self.user
+        )
+        first = Ticket.objects.get(pk=ticket.pk)
+        second = Ticket.objects.get(pk=ticket.pk)
+        third = Ticket.objects.get(pk=ticket.pk)
+
+        # A bulk action lands between the loads and the saves, and both
+        # copies then resolve the ticket.
+        apply_bulk_action(self.user, [ticket.pk], 'prioritize',
+                          priority='high')
+        first.status = 'resolved'
+        first.save()
+        second.status = 'resolved'
+        second.save()
+        self.assertEqual(reconcile_counters(), [])
+        self.assertEqual(reconcile_user_counters(), [])
+        self.assertCountsMatch({'open': 0, 'in-progress': 0, 'resolved': 1})
+
+        third.delete()
+        self.assertEqual(reconcile_counters(), [])
+        self.assertEqual(reconcile_user_counters(), [])
+        self.assertCountsMatch({'open': 0, 'in-progress': 0, 'resolved': 0})
+
+    def test_endpoint_reads_one_row(self):
+        Ticket.objects.create(
+            title='Printer', description='Jammed', created_user=self.user
+        )
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/tickets/user-stats/')
+        self.assertEqual(response.data['openTickets'], 1)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn(
+            'tickets_userticketcounter', context.captured_queries[0]['sql']
+        )
+
+    def test_reconcile_repairs_drift(self):
+        Ticket.objects.create(
+            title='Printer', description='Jammed', created_user=self.user
+        )
+        UserTicketCounter.objects.update(open=5, resolved=2)
+        other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        Ticket.objects.bulk_create([Ticket(
+            title='VPN', description='Down', created_user=other
+        )])
+
+        out = StringIO()
+        call_command('reconcile_ticket_stats', stdout=out)
+        self.assertIn('2 user counter(s)', out.getvalue())
+        self.assertCountsMatch({'open': 1, 'in-progress': 0, 'resolved': 0})
+        self.assertEqual(user_ticket_counts(other.pk)['open'], 1)
+        self.assertEqual(reconcile_user_counters(), [])
+
+
+def legacy_has_permission(user, method, ticket):
+    """``IsOwnerOrAdmin`` and ``CanEditTicket`` as they compared owners."""
+    if not (user.is_staff or ticket.created_user == user):
+        return False
+    if method in SAFE_METHODS:
+        return True
+    if ticket.status == 'resolved':
+        return False
+    if user.is_staff:
+        return True
+    return user == ticket.created_user
+
+
+class TicketPolicyTests(TestCase):
+    """The queryset rules must agree with the former per-object checks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+        for user in (cls.owner, cls.other):
+            for status, _ in STATUS_CHOICES:
+                Ticket.objects.create(
+                    title=status, description='Text', status=status,
+                    created_user=user
+                )
+
+    def cases(self):
+        for user in (self.owner, self.other, self.admin):
+            for ticket in Ticket.objects.select_related('created_user'):
+                yield user, ticket
+
+    def test_rules_match_object_checks(self):
+        for user, ticket in self.cases():
+            with self.subTest(user=user.email, ticket=ticket.title):
+                visible = legacy_has_permission(user, 'GET', ticket)
+                editable = legacy_has_permission(user, 'PATCH', ticket)
+                self.assertEqual(can_view(user, ticket), visible)
+                self.assertEqual(can_edit(user, ticket), editable)
+                self.assertEqual(can_see(user, make_event(
+                    ticket.pk, ticket.created_user_id, None,
+                    ticket.tracked_state()
+                )), visible)
+                self.assertEqual(filter_visible(
+                    Ticket.objects.filter(pk=ticket.pk), user
+                ).exists(), visible)
+                self.assertEqual(filter_editable(
+                    Ticket.objects.filter(pk=ticket.pk), user
+                ).exists(), editable)
+
+    def test_endpoints_apply_rules_without_loading_owners(self):
+        client = APIClient()
+        for user, ticket in self.cases():
+            client.force_authenticate(user)
+            url = f'/tickets/{ticket.pk}/'
+            visible = legacy_has_permission(user, 'GET', ticket)
+            with self.subTest(user=user.email, ticket=ticket.title):
+                with CaptureQueriesContext(connection) as context:
+                    get = client.get(url)
+                    patch = client.patch(url, {'title': ticket.title})
+                self.assertEqual(get.status_code, 200 if visible else 404)
+                if not visible:
+                    expected = 404
+                elif legacy_has_permission(user, 'PATCH', ticket):
+                    expected = 200
+                else:
+                    expected = 403
+                self.assertEqual(patch.status_code, expected)
+                self.assertFalse([
+                    query for query in context.captured_queries
+                    if 'FROM "accounts_user"' in query['sql']
+                ])
+
+    def test_list_and_bulk(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get('/tickets/')
+        self.assertEqual(
+            {ticket['created_user'] for ticket in response.data['results']},
+            {self.owner.pk}
+        )
+
+        others = list(
+            Ticket.objects.filter(created_user=self.other).values_list(
+                'pk', flat=True
+            )
+        )
+        result = apply_bulk_action(self.owner, others, 'resolve')
+        self.assertEqual(result['not_found'], len(others))
+
+
+class BulkActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+        cls.tickets = [
+            Ticket.objects.create(
+                title=f'Ticket {i}', description='Broken', status=status,
+                priority='low', created_user=cls.owner
+            )
+            for i, status in enumerate(['open', 'in-progress', 'resolved'])
+        ]
+        cls.ids = [ticket.pk for ticket in cls.tickets]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def bulk(self, **data):
+        return self.client.post('/tickets/bulk/', data, format='json')
+
+    def test_outcomes(self):
+        missing = max(self.ids) + 1
+        response = self.bulk(
+            ids=[self.ids[1], missing, self.ids[2], self.ids[1]],
+            action='resolve'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'updated': 1,
+            'skipped': 1,
+            'not_found': 1,
+            'results': [
+                {
+                    'id': self.ids[1], 'outcome': 'updated',
+                    'status': 'resolved', 'priority': 'low',
+                    'assigned_to': None,
+                },
+                {
+                    'id': missing, 'outcome': 'not_found',
+                    'detail': 'Ticket not found.',
+                },
+                {
+                    'id': self.ids[2], 'outcome': 'skipped',
+                    'detail': 'Resolved tickets cannot be edited.',
+                },
+            ],
+        })
+        self.assertEqual(reconcile_counters(), [])
+        self.assertEqual(reconcile_user_counters(), [])
+
+    def test_assign_and_prioritize(self):
+        response = self.bulk(
+            ids=self.ids[:2], action='assign', assignee=self.admin.pk
+        )
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['in-progress', 'in-progress']
+        )
+        self.assertEqual(
+            set(Ticket.objects.filter(pk__in=self.ids[:2]).values_list(
+                'assignee', flat=True
+            )),
+            {self.admin.pk}
+        )
+
+        response = self.bulk(ids=self.ids, action='prioritize',
+                             priority='high')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(
+            list(Ticket.objects.filter(pk__in=self.ids).order_by('pk')
+                 .values_list('priority', 'queue_rank')),
+            [('high', 0), ('high', 0), ('low', None)]
+        )
+        self.assertEqual(reconcile_counters(), [])
+
+    def test_validation_and_permissions(self):
+        response = self.bulk(ids=self.ids, action='prioritize')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('priority', response.data)
+        response = self.bulk(ids=self.ids, action='assign')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.owner)
+        response = self.bulk(ids=self.ids, action='resolve')
+        self.assertEqual(response.status_code, 403)
+
+    def test_after_commit_work_follows_the_write_database(self):
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            apply_bulk_action(self.admin, self.ids, 'resolve')
+        # The stats cache bump and the event publication.
+        self.assertEqual(on_commit.call_count, 2)
+        for call in on_commit.call_args_list:
+            self.assertEqual(call.kwargs['using'], 'default')
+
+
+class WorkQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.agent = User.objects.create_superuser(
+            'jane@example.com', 'Passw0rd!'
+        )
+        cls.other = User.objects.create_superuser(
+            'mark@example.com', 'Passw0rd!'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.agent)
+
+    def create(self, title, priority='medium', **kwargs):
+        return Ticket.objects.create(
+            title=title, description='Text', priority=priority,
+            created_user=self.owner, **kwargs
+        )
+
+    def test_queue_order_and_workload(self):
+        low = self.create('low', 'low', assignee=self.agent)
+        first = self.create('first high', 'high', assignee=self.agent)
+        second = self.create('second high', 'high', assignee=self.agent)
+        self.create('done', 'high', assignee=self.agent, status='resolved')
+        self.create('unassigned', 'high')
+        self.create('other', 'low', assignee=self.other)
+
+        response = self.client.get('/tickets/queue/')
+        self.assertEqual(
+            [ticket['id'] for ticket in response.data['results']],
+            [first.pk, second.pk, low.pk]
+        )
+        self.assertEqual(
+            response.data['results'][0]['assignee'], self.agent.pk
+        )
+        response = self.client.get(f'/tickets/queue/?assignee={self.other.pk}')
+        self.assertEqual(response.data['count'], 1)
+        response = self.client.get('/tickets/queue/?assignee=jane')
+        self.assertEqual(response.status_code, 400)
+
+        with self.assertNumQueries(1):
+            workloads = agent_workloads()
+        self.assertEqual(workloads, [
+            {
+                'assignee': self.agent.pk, 'total': 3,
+                'byPriority': {'high': 2, 'medium': 0, 'low': 1},
+            },
+            {
+                'assignee': self.other.pk, 'total': 1,
+                'byPriority': {'high': 0, 'medium': 0, 'low': 1},
+            },
+        ])
+        self.client.force_authenticate(self.owner)
+        response = self.client.get('/tickets/workload/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_assignment_fills_both_fields(self):
+        ticket = self.create('ticket')
+        response = self.client.patch(
+            f'/tickets/{ticket.pk}/', {'assigned_to': 'jane'}
+        )
+        self.assertEqual(response.data['assignee'], self.agent.pk)
+        self.assertEqual(response.data['status'], 'in-progress')
+
+        response = self.client.patch(
+            f'/tickets/{ticket.pk}/', {'assignee': self.other.pk}
+        )
+        self.assertEqual(response.data['assigned_to'], 'mark@example.com')
+        self.assertEqual(find_assignee('nobody'), None)
+
+        response = self.client.patch(
+            f'/tickets/{ticket.pk}/', {'assignee': self.owner.pk}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_actions_keep_queue_rank(self):
+        tickets = [self.create(str(i), 'low') for i in range(3)]
+        ids = [ticket.pk for ticket in tickets]
+        apply_bulk_action(
+            self.agent, ids, 'assign', assigned_to='jane@example.com',
+            assignee=self.agent
+        )
+        apply_bulk_action(self.agent, ids[:2], 'prioritize', priority='high')
+        apply_bulk_action(self.agent, ids[:1], 'resolve')
+        self.assertEqual(
+            list(agent_queue(self.agent.pk).values_list('pk', flat=True)),
+            [ids[1], ids[2]]
+        )
+        for ticket in Ticket.objects.all():
+            self.assertEqual(
+                ticket.queue_rank, queue_rank(ticket.status, ticket.priority)
+            )
+
+
+class TicketAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        Ticket.objects.bulk_create(
+            Ticket(
+                title=f'Printer {i}', description='Out of toner',
+                created_user=cls.owner
+            )
+            for i in range(30)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get(self, query=''):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/tickets/ticket/' + query)
+        self.assertEqual(response.status_code, 200)
+        counts = [
+            query['sql'] for query in context.captured_queries
+            if 'COUNT(' in query['sql'] and 'tickets_ticket"' in query['sql']
+        ]
+        return response, counts
+
+    def test_changelist_counts_once_and_skips_description(self):
+        response, counts = self.get()
+        self.assertEqual(response.context['cl'].result_count, 30)
+        self.assertEqual(len(counts), 1)
+        ticket = response.context['cl'].result_list[0]
+        self.assertEqual(ticket.get_deferred_fields(), {'description'})
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with mock.patch.object(EstimatedCountPaginator, 'threshold', 10):
+            response, counts = self.get()
+            self.assertEqual(response.context['cl'].result_count, 30)
+            self.assertEqual(counts, [])
+            response, counts = self.get('?status__exact=open')
+            self.assertEqual(len(counts), 1)
+
+    def test_search(self):
+        ticket = Ticket.objects.first()
+        response, _ = self.get(f'?q={ticket.pk}')
+        self.assertEqual(list(response.context['cl'].result_list), [ticket])
+        response, _ = self.get('?q=OWNER@')
+        self.assertEqual(response.context['cl'].result_count, 30)
+        response, _ = self.get('?q=nobody@')
+        self.assertEqual(response.context['cl'].result_count, 0)
+        response, _ = self.get('?q=toner')
+        self.assertEqual(response.context['cl'].result_count, 30)
+        error = Ticket.objects.create(
+            title=f'Error {ticket.pk} on login', description='Broken',
+            created_user=self.owner
+        )
+        response, _ = self.get(f'?q={ticket.pk}')
+        self.assertEqual(
+            set(response.context['cl'].result_list), {ticket, error}
+        )
+        with mock.patch('tickets.search.get_backend', return_value=None):
+            response, _ = self.get(f'?q={ticket.pk}')
+        self.assertEqual(
+            set(response.context['cl'].result_list), {ticket, error}
+        )
+
+        response = self.client.get(
+            '/admin/autocomplete/', {
+                'app_label': 'tickets', 'model_name': 'ticket',
+                'field_name': 'assignee', 'term': '',
+            }
+        )
+        self.assertEqual(
+            [result['id'] for result in response.json()['results']],
+            [str(self.admin.pk)]
+        )
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner@example.com', 'Passw0rd!')
+        cls.other = User.objects.create_user('other@example.com', 'Passw0rd!')
+        cls.admin = User.objects.create_superuser(
+            'staff@example.com', 'Passw0rd!'
+        )
+        for i, status in enumerate(
+            ['open', 'resolved', 'resolved', 'in-progress', 'resolved']
+        ):
+            Ticket.objects.create(
+                title=f'Printer {i}', description='Out of toner',
+                status=status, created_user=cls.owner
+            )
+        Ticket.objects.create(
+            title='Other', description='Text', status='resolved',
+            created_user=cls.other
+        )
+        # All but the newest resolved ticket were resolved long ago.
+        cls.old = list(Ticket.objects.filter(
+            status='resolved', title__in=['Printer 1', 'Printer 2', 'Other']
+        ).order_by('id').values_list('id', flat=True))
+        Ticket.objects.filter(id__in=cls.old).update(
+            updated_at=timezone.now() - timezone.timedelta(days=100)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.backend = LocalEventBackend(10)
+        patcher = mock.patch.object(ticket_events, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def archive(self):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_tickets', batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_interrupted_batch_rolls_back(self):
+        for target in ('tickets.archive.delete_rows',
+                       'tickets.archive.tickets_archived.send'):
+            with mock.patch(target, side_effect=DatabaseError), \
+                    self.assertRaises(DatabaseError):
+                archive_batch(archive_cutoff())
+            self.assertFalse(ArchivedTicket.objects.exists(), target)
+            self.assertEqual(Ticket.objects.count(), 6, target)
+
+        self.assertEqual(archive_batch(archive_cutoff()), 3)
+        self.assertEqual(reconcile_counters(), [])
+        self.assertEqual(reconcile_user_counters(), [])
+
+    def test_archive_moves_old_resolved_tickets_in_batches(self):
+        output = self.archive()
+        self.assertIn('Archived 2 ticket(s).\nArchived 1 ticket(s).', output)
+        self.assertEqual(
+            list(ArchivedTicket.objects.order_by('id').values_list(
+                'id', flat=True
+            )),
+            self.old
+        )
+        self.assertFalse(Ticket.objects.filter(id__in=self.old).exists())
+        self.assertEqual(Ticket.objects.count(), 3)
+        self.assertIn('Archived 0 ticket(s)', self.archive())
+
+        self.assertEqual(reconcile_counters(), [])
+        self.assertEqual(reconcile_user_counters(), [])
+        self.assertEqual(user_ticket_counts(self.owner.pk)['resolved'], 1)
+        self.assertEqual(
+            [event['type'] for event in self.backend.since(0)],
+            ['archived'] * 3
+        )
+        self.client.force_login(self.admin)
+        for term in ('Printer', str(self.old[0]), 'owner@'):
+            response = self.client.get(
+                '/admin/tickets/archivedticket/', {'q': term}
+            )
+            self.assertEqual(response.status_code, 200)
+        # Creation history still counts the archived tickets.
+        rebuild_ticket_creation_rollup()
+        self.assertEqual(
+            sum(TicketCreationRollup.objects.values_list('count', flat=True)),
+            6
+        )
+
+    def test_lists_include_archived_tickets_on_request(self):
+        self.archive()
+        hot = Ticket.objects.filter(created_user=self.owner)
+        everything = sorted(
+            [*hot, *ArchivedTicket.objects.filter(created_user=self.owner)],
+            key=lambda ticket: (ticket.created_at, ticket.pk), reverse=True
+        )
+        expected = [ticket.pk for ticket in everything]
+
+        response = self.client.get('/tickets/')
+        self.assertEqual(response.data['count'], hot.count())
+        response = self.client.get('/tickets/?include_archived=1')
+        self.assertEqual(response.data['count'], len(expected))
+        self.assertEqual(
+            [ticket['id'] for ticket in response.data['results']], expected
+        )
+        response = self.client.get(
+            '/tickets/?include_archived=1&page_size=2&page=2'
+        )
+        self.assertEqual(
+            [ticket['id'] for ticket in response.data['results']],
+            expected[2:4]
+        )
+
+        url = '/tickets/?include_archived=1&pagination=cursor&page_size=2'
+        ids = []
+        while url:
+            response = self.client.get(url)
+            ids += [ticket['id'] for ticket in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+
+        response = self.client.get(
+            '/tickets/?include_archived=1&status=resolved&search=toner'
+        )
+        self.assertEqual(response.data['count'], 3)
+        response = self.client.get(
+            '/tickets/export/?include_archived=1&file_format=ndjson'
+        )
+        self.assertEqual(
+            len(b''.join(response.streaming_content).splitlines()),
+            len(expected)
+        )
+
+    def test_detail_and_stats(self):
+        self.archive()
+        url = f'/tickets/{self.old[0]}/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = self.client.get(url + '?include_archived=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'resolved')
+        response = self.client.get(
+            url + '?include_archived=1',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.patch(url, {'title': 'Changed'})
+        self.assertEqual(response.status_code, 404)
+        other = f'/tickets/{self.old[-1]}/?include_archived=1'
+        self.assertEqual(self.client.get(other).status_code, 404)
+
+        response = self.client.get('/tickets/user-stats/')
+        self.assertEqual(response.data['resolvedTickets'], 1)
+        response = self.client.get('/tickets/user-stats/?include_archived=1')
+        self.assertEqual(response.data['resolvedTickets'], 3)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/tickets/stats/')
+        self.assertEqual(response.data['totalTickets'], 3)
+        response = self.client.get('/tickets/stats/?include_archived=1')
+        self.assertEqual(response.data['totalTickets'], 6)
+        self.assertEqual(response.data['resolvedTickets'], 4)
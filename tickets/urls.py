@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -5,14 +6,48 @@ from . import views
 router = DefaultRouter()
 router.register(r'', views.TicketViewSet, basename='ticket')
 
+if settings.ASYNC_READ_VIEWS:
+    stats_view = views.AsyncTicketStatsView
+    user_stats_view = views.AsyncUserTicketStatsView
+else:
+    stats_view = views.TicketStatsView
+    user_stats_view = views.UserTicketStatsView
+
 urlpatterns = [
     path(
-        'stats/', views.TicketStatsView.as_view(), name='ticket-stats'
+        'stats/', stats_view.as_view(), name='ticket-stats'
     ),
     path(
         'user-stats/',
-        views.UserTicketStatsView.as_view(),
+        user_stats_view.as_view(),
         name='user-ticket-stats'
     ),
+    path(
+        'events/',
+        views.TicketEventStreamView.as_view(),
+        name='ticket-events'
+    ),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    # Reads are answered asynchronously; writes to the same routes are
+    # handed to the viewset. Both must come before the router's patterns.
+    urlpatterns += [
+        path('', views.AsyncTicketListView.as_view(
+            fallback=views.TicketViewSet.as_view(
+                {'get': 'list', 'post': 'create'}
+            )
+        )),
+        path('<int:pk>/', views.AsyncTicketDetailView.as_view(
+            fallback=views.TicketViewSet.as_view({
+                'get': 'retrieve',
+                'put': 'update',
+                'patch': 'partial_update',
+                'delete': 'destroy'
+            })
+        )),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
@@ -1,27 +1,191 @@
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import viewsets
-from .models import Ticket
-from .serializers import TicketSerializer
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.http import Http404, StreamingHttpResponse
+from functools import partial
+from asgiref.sync import sync_to_async
+from .models import ArchivedTicket, Ticket
+from .serializers import (
+    TicketSerializer, TicketBulkActionSerializer, get_values_plan
+)
+from .archive import MergedRows, include_archived
+from .bulk import apply_bulk_action
 from rest_framework.exceptions import PermissionDenied
-from .permissions import IsOwnerOrAdmin, CanEditTicket
-from .pagination import TicketPagination
+from .permissions import IsOwnerOrAdmin, CanEditTicket, filter_visible
+from .pagination import TicketPagination, TicketCursorPagination
+from .queue import agent_queue, agent_workloads
+from .stats import (
+    get_ticket_counts, ticket_creation_by_month, ticket_creation_series,
+    recent_tickets, user_ticket_counts, auser_ticket_counts,
+    archived_ticket_counts, archived_user_ticket_counts, add_ticket_counts,
+    add_user_ticket_counts, build_ticket_dashboard,
+    build_user_ticket_dashboard
+)
+from .events import EventStreamRenderer, ticket_events
+from .export import (
+    EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES, EXPORT_WRITERS
+)
+from .filters import TicketSearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
-from django.db.models import Count
-from django.db.models.functions import TruncMonth
 from datetime import datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
+from ticsol.cache import ticket_stats_cache, user_ticket_stats_cache
+from ticsol.conditional import etag_matches, make_etag, not_modified
+from ticsol.concurrency import run_concurrently
+from ticsol.rollups import parse_series_range, series_cache_key
+from ticsol.views import AsyncAPIView, ReplicaReadMixin
 
 
-class TicketViewSet(viewsets.ModelViewSet):
+class TicketViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Ticket.objects.all().order_by('-created_at')
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrAdmin, CanEditTicket]
     pagination_class = TicketPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    cursor_pagination_class = TicketCursorPagination
+    filter_backends = [DjangoFilterBackend, TicketSearchFilter]
     filterset_fields = ['status', 'priority']
+    search_fields = ['title', 'description', 'assigned_to']
+
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination when the client opts in with
+        ``?pagination=cursor`` or follows a cursor link.
+        """
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            params = request.query_params if request is not None else {}
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_values_plan(self):
+        return get_values_plan(self.get_serializer_class())
+
+    def get_list_queryset(self):
+        """
+        Filtered tickets as ``values_list`` rows for the values plan, merged
+        with the filtered archived tickets on ``?include_archived=1``.
+        """
+        plan = self.get_values_plan()
+        queryset = plan.rows(self.filter_queryset(self.get_queryset()))
+        if not include_archived(self.request):
+            return queryset
+        archived = plan.rows(
+            self.filter_queryset(self.get_archived_queryset())
+        )
+        return MergedRows([queryset, archived], ('-created_at', '-pk'))
+
+    def get_archived_queryset(self):
+        return filter_visible(ArchivedTicket.objects.all(), self.request.user)
+
+    def get_archived_row(self):
+        """The requested archived ticket as a values row, or ``None``."""
+        rows = self.get_values_plan().rows(self.get_archived_queryset())
+        try:
+            return rows.filter(pk=self.kwargs['pk']).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def get_archived_response(self):
+        """
+        Render the requested ticket from the archive on
+        ``?include_archived=1``, or return ``None`` to answer 404.
+        """
+        if not include_archived(self.request):
+            return None
+        row = self.get_archived_row()
+        if row is None:
+            return None
+        etag = self.get_ticket_etag(row.pk, row.updated_at)
+        if etag_matches(self.request, etag):
+            return not_modified(etag)
+        response = Response(self.get_values_plan().to_representation(row))
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_page_response(page)
+        return Response(self.get_values_plan().render(queryset))
+
+    def get_page_response(self, page):
+        """
+        Render a page of values rows, or answer 304 when the client's
+        ``If-None-Match`` already holds the page's ETag.
+        """
+        etag = self.get_page_etag(page)
+        if etag_matches(self.request, etag):
+            return not_modified(etag)
+        response = self.get_paginated_response(
+            self.get_values_plan().render(page)
+        )
+        response['ETag'] = etag
+        return response
+
+    def get_page_etag(self, page):
+        """
+        ETag over the request, the user's scope, the paging state and the
+        ``id`` and ``updated_at`` of every row on the page, all of which
+        are known before anything is rendered.
+        """
+        paginator = self.paginator
+        if isinstance(paginator, TicketPagination):
+            state = paginator.page.paginator.count
+        else:
+            state = (paginator.has_next, paginator.has_previous)
+        user = self.request.user
+        return make_etag(
+            self.request.build_absolute_uri(),
+            'staff' if user.is_staff else user.pk,
+            state,
+            [(row.pk, row.updated_at) for row in page]
+        )
+
+    def get_ticket_etag(self, pk, updated_at):
+        return make_etag('ticket', pk, updated_at)
+
+    def get_current_ticket_etag(self):
+        """
+        ETag of the requested ticket read from its ``updated_at`` alone,
+        or ``None`` when the user cannot see it.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            row = queryset.filter(pk=self.kwargs['pk']).values_list(
+                'pk', 'updated_at'
+            ).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+        return self.get_ticket_etag(*row) if row else None
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            etag = self.get_current_ticket_etag()
+            if etag is not None and etag_matches(request, etag):
+                return not_modified(etag)
+
+        try:
+            instance = self.get_object()
+        except Http404:
+            response = self.get_archived_response()
+            if response is None:
+                raise
+            return response
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = self.get_ticket_etag(
+            instance.pk, instance.updated_at
+        )
+        return response
 
     def perform_create(self, serializer):
         if self.request.user.is_staff:
@@ -31,98 +195,317 @@ class TicketViewSet(viewsets.ModelViewSet):
         serializer.save(created_user=self.request.user)
 
     def get_queryset(self):
-        if self.request.user.is_staff:
-            return Ticket.objects.all().order_by('-created_at')
-        return Ticket.objects.filter(created_user=self.request.user)
+        return filter_visible(
+            Ticket.objects.order_by('-created_at'), self.request.user
+        )
+
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[IsAdminUser],
+        serializer_class=TicketBulkActionSerializer
+    )
+    def bulk(self, request):
+        """Assign, re-prioritise or resolve many tickets in one request."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = apply_bulk_action(request.user, **serializer.validated_data)
+        return Response(result)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def queue(self, request):
+        """
+        An agent's open and in-progress tickets, most urgent then oldest,
+        in pages like the list. Shows the requesting admin's own queue
+        unless ``?assignee=`` names another agent.
+        """
+        agent_id = request.query_params.get('assignee', request.user.pk)
+        try:
+            agent_id = int(agent_id)
+        except ValueError:
+            return Response(
+                {'error': 'assignee must be a user id.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        plan = self.get_values_plan()
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            plan.rows(agent_queue(agent_id)), request, view=self
+        )
+        return paginator.get_paginated_response(plan.render(page))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def workload(self, request):
+        """Open and in-progress ticket counts per agent."""
+        return Response(agent_workloads())
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every ticket matching the list filters as CSV or NDJSON.
+
+        Rows are read through a server-side cursor in fixed-size chunks, so
+        memory use does not grow with the size of the export.
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_WRITERS:
+            return Response(
+                {
+                    'error': 'Unsupported export format. Use one of: ' +
+                    ', '.join(EXPORT_WRITERS)
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_list_queryset()
+        # Rows are read after the view returns, so fix the database now.
+        queryset = queryset.using(queryset.db)
+        plan = self.get_values_plan()
+        records = map(
+            plan.to_representation,
+            queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
 
+        response = StreamingHttpResponse(
+            EXPORT_WRITERS[file_format](plan.keys, records),
+            content_type=EXPORT_CONTENT_TYPES[file_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="tickets.{file_format}"'
+        )
+        return response
 
-class TicketStatsView(APIView):
+
+class TicketStatsView(ReplicaReadMixin, APIView):
     """
     API endpoint to provide ticket statistics for the admin dashboard
     """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        total_tickets = Ticket.objects.count()
-        open_tickets = Ticket.objects.filter(status='open').count()
-        in_progress_tickets = Ticket.objects.filter(
-            status='in-progress'
-        ).count()
-        resolved_tickets = Ticket.objects.filter(status='resolved').count()
-
-        tickets_by_priority = {
-            'low': Ticket.objects.filter(priority='low').count(),
-            'medium': Ticket.objects.filter(priority='medium').count(),
-            'high': Ticket.objects.filter(priority='high').count()
-        }
-
         current_year = datetime.now().year
-        ticket_creation_by_month = [0] * 12
-
-        tickets_by_month = Ticket.objects.filter(
-            created_at__year=current_year
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            count=Count('id')
-        ).order_by('month')
-
-        for entry in tickets_by_month:
-            month_idx = entry['month'].month - 1
-            ticket_creation_by_month[month_idx] = entry['count']
-
-        recent_tickets = Ticket.objects.all().order_by('-created_at')[:5]
-        recent_tickets_data = []
-
-        for ticket in recent_tickets:
-            recent_tickets_data.append({
-                'id': ticket.id,
-                'title': ticket.title,
-                'priority': ticket.priority,
-                'status': ticket.status,
-                'createdAt': ticket.created_at.strftime('%Y-%m-%d'),
-                'assignedTo': ticket.assigned_to
-            })
-
-        return Response({
-            'totalTickets': total_tickets,
-            'openTickets': open_tickets,
-            'inProgressTickets': in_progress_tickets,
-            'resolvedTickets': resolved_tickets,
-            'ticketsByPriority': tickets_by_priority,
-            'ticketCreationByMonth': ticket_creation_by_month,
-            'ticketsByStatus': [
-                open_tickets, in_progress_tickets, resolved_tickets
-            ],
-            'recentTickets': recent_tickets_data
-        })
-
-
-class UserTicketStatsView(APIView):
+        series_range = parse_series_range(request.query_params)
+        archived = include_archived(request)
+        key = series_cache_key(current_year, series_range)
+        data = ticket_stats_cache.get_or_set(
+            f'{key}:archived' if archived else key,
+            lambda: self.get_stats(current_year, series_range, archived)
+        )
+        return Response(data)
+
+    def get_stats(self, current_year, series_range=None, archived=False):
+        counts = get_ticket_counts()
+        if archived:
+            counts = add_ticket_counts(counts, archived_ticket_counts())
+        return build_ticket_dashboard(
+            counts,
+            ticket_creation_by_month(current_year),
+            recent_tickets(),
+            ticket_creation_series(series_range) if series_range else None
+        )
+
+
+class UserTicketStatsView(ReplicaReadMixin, APIView):
     """API endpoint to provide ticket statistics for the user dashboard"""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        status_counts = Ticket.objects.filter(
-            created_user=request.user
-        ).values('status').annotate(
-            count=Count('id')
-        ).order_by()
-
-        counts = {
-            'open': 0,
-            'in-progress': 0,
-            'resolved': 0,
-        }
-
-        for item in status_counts:
-            counts[item['status']] = item['count']
-
-        total_tickets = sum(counts.values())
-
-        return Response({
-            'totalTickets': total_tickets,
-            'openTickets': counts['open'],
-            'inProgressTickets': counts['in-progress'],
-            'resolvedTickets': counts['resolved']
-        })
+        archived = include_archived(request)
+        data = user_ticket_stats_cache.get_or_set(
+            'counts:archived' if archived else 'counts',
+            lambda: self.get_stats(request.user, archived),
+            scope=request.user.pk
+        )
+        return Response(data)
+
+    def get_stats(self, user, archived=False):
+        counts = user_ticket_counts(user.pk)
+        if archived:
+            counts = add_user_ticket_counts(
+                counts, archived_user_ticket_counts(user.pk)
+            )
+        return build_user_ticket_dashboard(counts)
+
+
+class AsyncTicketViewMixin(ReplicaReadMixin):
+    """Reuses ``TicketViewSet`` for querysets, filtering and pagination."""
+    permission_classes = TicketViewSet.permission_classes
+
+    def get_viewset(self, request, action):
+        return TicketViewSet(
+            request=request, args=self.args, kwargs=self.kwargs,
+            format_kwarg=None, action=action
+        )
+
+
+class AsyncTicketListView(AsyncTicketViewMixin, AsyncAPIView):
+    """
+    Async ticket list. Page-number pages fetch their rows and run the
+    total count concurrently instead of one after the other.
+    """
+
+    async def get(self, request):
+        viewset = await sync_to_async(self.get_viewset)(request, 'list')
+        queryset = await sync_to_async(viewset.get_list_queryset)()
+        paginator = viewset.paginator
+        page = None
+        if isinstance(paginator, TicketPagination):
+            page = await self.get_page(paginator, queryset)
+
+        # Keyset pages are a single query, and unusual page-number requests
+        # (``page=last``, out of range) take the synchronous path for the
+        # same results and errors.
+        if page is None:
+            page = await sync_to_async(paginator.paginate_queryset)(
+                queryset, request, viewset
+            )
+        return viewset.get_page_response(page)
+
+    async def get_page(self, paginator, queryset):
+        page_size = paginator.get_page_size(self.request)
+        try:
+            number = int(self.request.query_params.get(
+                paginator.page_query_param, 1
+            ))
+        except ValueError:
+            return None
+        if number < 1:
+            return None
+
+        bottom = (number - 1) * page_size
+        count, rows = await run_concurrently(
+            queryset.count, partial(list, queryset[bottom:bottom + page_size])
+        )
+
+        django_paginator = paginator.django_paginator_class(
+            queryset, page_size
+        )
+        django_paginator.count = count
+        try:
+            page = django_paginator.page(number)
+        except InvalidPage:
+            return None
+        page.object_list = rows
+        paginator.page = page
+        paginator.request = self.request
+        return rows
+
+
+class AsyncTicketDetailView(AsyncTicketViewMixin, AsyncAPIView):
+    """Async ticket retrieve."""
+
+    async def get(self, request, pk):
+        viewset = await sync_to_async(self.get_viewset)(request, 'retrieve')
+        queryset = await sync_to_async(
+            lambda: viewset.filter_queryset(viewset.get_queryset())
+        )()
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            row = await queryset.filter(pk=pk).values_list(
+                'pk', 'updated_at'
+            ).afirst()
+            if row is not None:
+                etag = viewset.get_ticket_etag(*row)
+                if etag_matches(request, etag):
+                    return not_modified(etag)
+
+        try:
+            ticket = await queryset.aget(pk=pk)
+        except Ticket.DoesNotExist:
+            response = await sync_to_async(viewset.get_archived_response)()
+            if response is None:
+                raise Http404('No Ticket matches the given query.')
+            return response
+        data = await sync_to_async(self.retrieve)(viewset, ticket)
+        response = Response(data)
+        response['ETag'] = viewset.get_ticket_etag(
+            ticket.pk, ticket.updated_at
+        )
+        return response
+
+    def retrieve(self, viewset, ticket):
+        self.check_object_permissions(self.request, ticket)
+        return viewset.get_serializer(ticket).data
+
+
+class AsyncTicketStatsView(ReplicaReadMixin, AsyncAPIView):
+    """Async ``TicketStatsView``; its three queries run concurrently."""
+    permission_classes = TicketStatsView.permission_classes
+
+    async def get(self, request):
+        current_year = datetime.now().year
+        series_range = parse_series_range(request.query_params)
+        archived = include_archived(request)
+        key = series_cache_key(current_year, series_range)
+        data = await ticket_stats_cache.aget_or_set(
+            f'{key}:archived' if archived else key,
+            lambda: self.get_stats(current_year, series_range, archived)
+        )
+        return Response(data)
+
+    async def get_stats(self, current_year, series_range=None,
+                        archived=False):
+        queries = [
+            get_ticket_counts,
+            partial(ticket_creation_by_month, current_year),
+            recent_tickets
+        ]
+        if series_range:
+            queries.append(partial(ticket_creation_series, series_range))
+        if archived:
+            queries.append(archived_ticket_counts)
+        results = await run_concurrently(*queries)
+        if archived:
+            results[0] = add_ticket_counts(results[0], results.pop())
+        return build_ticket_dashboard(*results)
+
+
+class AsyncUserTicketStatsView(ReplicaReadMixin, AsyncAPIView):
+    """Async ``UserTicketStatsView`` using the async ORM."""
+    permission_classes = UserTicketStatsView.permission_classes
+
+    async def get(self, request):
+        archived = include_archived(request)
+        data = await user_ticket_stats_cache.aget_or_set(
+            'counts:archived' if archived else 'counts',
+            lambda: self.get_stats(request.user, archived),
+            scope=request.user.pk
+        )
+        return Response(data)
+
+    async def get_stats(self, user, archived=False):
+        counts = await auser_ticket_counts(user.pk)
+        if archived:
+            counts = add_user_ticket_counts(counts, await sync_to_async(
+                archived_user_ticket_counts
+            )(user.pk))
+        return build_user_ticket_dashboard(counts)
+
+
+class TicketEventStreamView(AsyncAPIView):
+    """
+    Server-sent events for the tickets the user can see: ``created``,
+    ``updated``, ``resolved``, ``deleted`` and ``archived``. A reconnecting
+    client sends ``Last-Event-ID`` (or ``?last_event_id=``) to replay what
+    it missed.
+
+    The stream stays open, so serve it from ``ticsol.asgi``.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    async def get(self, request):
+        last_id = request.META.get(
+            'HTTP_LAST_EVENT_ID', request.query_params.get('last_event_id')
+        )
+        expires_at = (
+            request.auth.get('exp') if request.auth is not None else None
+        )
+        response = StreamingHttpResponse(
+            ticket_events.stream(
+                request.user, last_id or None, expires_at=expires_at
+            ),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
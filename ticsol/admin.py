@@ -0,0 +1,74 @@
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using):
+    """
+    The planner's row count estimate for ``model``'s table, or ``None``
+    when the database has no statistics for it yet.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)'
+    elif connection.vendor == 'sqlite':
+        # The first number of every ``sqlite_stat1`` row of a table is its
+        # row count as of the last ANALYZE.
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(float(str(row[0]).split()[0]))
+    # PostgreSQL reports -1 for tables that were never analyzed.
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts an unfiltered queryset from planner statistics once the table
+    holds more than ``threshold`` rows. Filtered querysets, and tables
+    small enough for the estimate to be noticeably off, are counted
+    exactly.
+    """
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables too large to count on every page.
+
+    The changelist is counted once, from estimates where possible, rather
+    than once with and once without the filters, and its rows skip the
+    ``list_defer`` columns that the list does not show.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_defer = ()
+
+    def get_changelist(self, request, **kwargs):
+        changelist = super().get_changelist(request, **kwargs)
+        list_defer = self.list_defer
+
+        class ProjectedChangeList(changelist):
+            def get_queryset(self, request, exclude_parameters=None):
+                queryset = super().get_queryset(request, exclude_parameters)
+                return queryset.defer(*list_defer)
+
+        return ProjectedChangeList
@@ -0,0 +1,141 @@
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from .db_routers import primary_reads
+
+# Backends whose entries only the process that wrote them can see.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    """
+    Whether every worker process sees the same default cache, which the
+    cross-process revocation and invalidation keys rely on. ``CACHE_SHARED``
+    overrides the guess made from the backend, e.g. for a deployment that
+    runs a single process.
+    """
+    shared = getattr(settings, 'CACHE_SHARED', None)
+    if shared is not None:
+        return shared
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+class VersionedCache:
+    """
+    Response cache whose entries are invalidated by bumping a version key.
+
+    Entries are stored with Django's cache ``version`` argument set to the
+    namespace's current version, so a single ``bump()`` makes every entry
+    written before it unreachable without having to know their keys.
+    A ``scope`` (e.g. a user id) gives an independent version per scope.
+
+    Missing values are computed on the primary. A replica may still lag
+    behind the write that bumped the version, and its result would then
+    be cached as current.
+
+    Bumps only reach other workers through a shared cache, so without one
+    (see ``cache_is_shared``) nothing is cached and every call computes.
+    """
+
+    def __init__(self, namespace, timeout=None):
+        self.namespace = namespace
+        self.timeout = timeout
+
+    def get_timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, 'STATS_CACHE_TIMEOUT', 3600)
+
+    def version_key(self, scope=None):
+        if scope is None:
+            return f'{self.namespace}:version'
+        return f'{self.namespace}:{scope}:version'
+
+    def get_version(self, scope=None):
+        key = self.version_key(scope)
+        version = cache.get(key)
+        if version is None:
+            # Start from a clock-based value so that an evicted version key
+            # never wraps back onto entries written under an older version.
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key, time.time_ns())
+        return version
+
+    def bump(self, scope=None):
+        key = self.version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+    def lookup(self, key, scope=None):
+        """Return ``(version, value)``; ``value`` is ``None`` on a miss."""
+        version = self.get_version(scope)
+        value = cache.get(self.entry_key(key, scope), version=version)
+        self.record('misses' if value is None else 'hits')
+        return version, value
+
+    def store(self, key, value, version, scope=None):
+        cache.set(
+            self.entry_key(key, scope), value, self.get_timeout(),
+            version=version
+        )
+
+    def get_or_set(self, key, compute, scope=None):
+        if not cache_is_shared():
+            return compute()
+        version, value = self.lookup(key, scope)
+        if value is None:
+            with primary_reads():
+                value = compute()
+            self.store(key, value, version, scope)
+        return value
+
+    async def aget_or_set(self, key, compute, scope=None):
+        """Async ``get_or_set``; ``compute`` is a coroutine function."""
+        if not cache_is_shared():
+            return await compute()
+        version, value = await sync_to_async(self.lookup)(key, scope)
+        if value is None:
+            with primary_reads():
+                value = await compute()
+            await sync_to_async(self.store)(key, value, version, scope)
+        return value
+
+    def entry_key(self, key, scope=None):
+        if scope is None:
+            return f'{self.namespace}:{key}'
+        return f'{self.namespace}:{scope}:{key}'
+
+    def record(self, counter):
+        key = f'{self.namespace}:{counter}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+    def metrics(self):
+        hits = cache.get(f'{self.namespace}:hits', 0)
+        misses = cache.get(f'{self.namespace}:misses', 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+        }
+
+    def reset_metrics(self):
+        cache.delete_many(
+            [f'{self.namespace}:hits', f'{self.namespace}:misses']
+        )
+
+
+ticket_stats_cache = VersionedCache('ticket-stats')
+user_ticket_stats_cache = VersionedCache('user-ticket-stats')
+user_stats_cache = VersionedCache('user-stats')
+
+STATS_CACHES = [ticket_stats_cache, user_ticket_stats_cache, user_stats_cache]
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    The process-wide pool of ``ASYNC_QUERY_WORKERS`` threads that
+    ``run_concurrently`` runs its callables on.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_QUERY_WORKERS', 4),
+                thread_name_prefix='run-concurrently'
+            )
+        return _executor
+
+
+def _close_old_connections():
+    for connection in connections.all(initialized_only=True):
+        connection.close_if_unusable_or_obsolete()
+
+
+def _run_in_worker(func):
+    # Worker threads outlive requests, so apply the same connection rules
+    # Django applies around a request, except that CONN_MAX_AGE=0 does not
+    # close the connection: the pool is small and long-lived, and closing
+    # would mean a new connection for every query.
+    _close_old_connections()
+    try:
+        return func()
+    finally:
+        _close_old_connections()
+        for connection in connections.all(initialized_only=True):
+            if connection.settings_dict['CONN_MAX_AGE'] == 0:
+                connection.close_at = None
+
+
+def _in_transaction():
+    return any(
+        connection.in_atomic_block
+        for connection in connections.all(initialized_only=True)
+    )
+
+
+async def run_concurrently(*funcs):
+    """
+    Run blocking ORM callables in parallel and return their results in
+    order.
+
+    Django's async ORM methods all hop onto the single thread-sensitive
+    executor, so independent queries issued through them still run one
+    after another. The callables here run on the threads of
+    ``get_executor()``, each of which keeps a database connection open
+    between calls, so the extra connections are bounded by the pool size
+    and reused across requests.
+
+    Inside a transaction (e.g. in tests) the callables run one by one on
+    the caller's connection instead, since other connections could not
+    see its uncommitted rows.
+    """
+    if await sync_to_async(_in_transaction)():
+        return await sync_to_async(lambda: [func() for func in funcs])()
+    executor = get_executor()
+    return await asyncio.gather(*(
+        sync_to_async(
+            _run_in_worker, thread_sensitive=False, executor=executor
+        )(func)
+        for func in funcs
+    ))
@@ -0,0 +1,24 @@
+import hashlib
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """Strong ETag over the ``repr`` of ``parts``."""
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    # If-None-Match uses the weak comparison.
+    return '*' in etags or etag in {tag.removeprefix('W/') for tag in etags}
+
+
+def not_modified(etag):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
@@ -0,0 +1,71 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def get_replica():
+    replicas = get_replicas()
+    return random.choice(replicas) if replicas else None
+
+
+def set_replica_reads(enabled):
+    _replica_reads.set(enabled)
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads of the block to the primary."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Keep the user's reads on the primary until replicas catch up."""
+    cache.set(
+        pin_key(user_id), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    )
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id), False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to a random ``DATABASE_REPLICAS`` alias while replica reads
+    are enabled for the current context, and everything else to the
+    primary. Views opt in with ``ticsol.views.ReplicaReadMixin``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            replica = get_replica()
+            if replica is not None:
+                return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Instances read from a replica remember it as their database.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
@@ -0,0 +1,265 @@
+import json
+import logging
+import random
+import re
+import time
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async
+)
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from .db_routers import get_replicas, pin_to_primary
+
+logger = logging.getLogger('ticsol.sql')
+
+PLACEHOLDER_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+NUMBER_RE = re.compile(r'\b\d+\b')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """Reduce a SQL statement to a shape shared by its repeated calls."""
+    sql = PLACEHOLDER_LIST_RE.sub('(%s, ...)', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def may_send_timing(user, response):
+    """
+    Whether ``Server-Timing`` metrics may go out on ``response``: with
+    ``SQL_INSTRUMENTATION_HEADER`` on, to staff users or under DEBUG.
+    """
+    if response.streaming or not getattr(
+        settings, 'SQL_INSTRUMENTATION_HEADER', True
+    ):
+        return False
+    return settings.DEBUG or bool(user and user.is_staff)
+
+
+def append_server_timing(response, *metrics):
+    """Add ``Server-Timing`` metrics, keeping any set by the view."""
+    header = ', '.join(metrics)
+    if response.has_header('Server-Timing'):
+        header = f"{response['Server-Timing']}, {header}"
+    response['Server-Timing'] = header
+
+
+class PhaseTimer:
+    """Collects named phase durations for a ``Server-Timing`` header."""
+
+    def __init__(self):
+        self.durations = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = (
+                self.durations.get(name, 0) + time.perf_counter() - started
+            )
+
+    def metrics(self):
+        return [
+            f'{name};dur={duration * 1000:.2f}'
+            for name, duration in self.durations.items()
+        ]
+
+
+class QueryRecorder:
+    """Database execute wrapper counting and timing every query."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        return [
+            {'shape': shape, 'count': count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold and shape.upper().startswith('SELECT')
+        ]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records the query count, database time and repeated query shapes of a
+    sample of requests.
+
+    Sampled requests get one structured log line on the ``ticsol.sql``
+    logger. Requests that repeat a SELECT shape at least
+    ``SQL_N_PLUS_ONE_THRESHOLD`` times are logged as warnings, since that
+    is the usual sign of an N+1 pattern. Responses to staff, or to anyone
+    under ``DEBUG``, also get a ``Server-Timing`` header. Streaming
+    responses are recorded until their content is consumed, and since
+    their headers are sent first they get no header.
+
+    Under ASGI the wrappers go on the connections of the request's
+    thread-sensitive executor thread, where sync views and the async ORM
+    run their queries. Queries spread over worker threads with
+    ``ticsol.concurrency.run_concurrently`` are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        stack = ExitStack()
+        with stack:
+            self.instrument(stack, recorder)
+            response = self.get_response(request)
+            if response.streaming:
+                self.report_after_stream(
+                    request, response, recorder, started, stack.pop_all()
+                )
+                return response
+        self.report(request, response, recorder, started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self.instrument)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(stack.close)()
+            raise
+        if response.streaming:
+            self.report_after_stream(
+                request, response, recorder, started, stack
+            )
+            return response
+        await sync_to_async(stack.close)()
+        await sync_to_async(self.report)(request, response, recorder, started)
+        return response
+
+    def sampled(self):
+        rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+    def instrument(self, stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def finish(self, request, response, recorder, started, stack):
+        stack.close()
+        self.report(request, response, recorder, started)
+
+    def report_after_stream(self, request, response, recorder, started,
+                            stack):
+        """Keep recording until the streamed content is consumed."""
+        content = response.streaming_content
+        finish = partial(
+            self.finish, request, response, recorder, started, stack
+        )
+        if response.is_async:
+            async def recorded_content():
+                try:
+                    async for chunk in content:
+                        yield chunk
+                finally:
+                    await sync_to_async(finish)()
+        else:
+            def recorded_content():
+                try:
+                    yield from content
+                finally:
+                    finish()
+        response.streaming_content = recorded_content()
+
+    def send_timing(self, request, response):
+        return may_send_timing(getattr(request, 'user', None), response)
+
+    def report(self, request, response, recorder, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = recorder.duration * 1000
+        if self.send_timing(request, response):
+            append_server_timing(
+                response,
+                f'db;dur={db_ms:.2f};desc="{recorder.count} queries"',
+                f'app;dur={total_ms - db_ms:.2f}',
+            )
+
+        repeated = recorder.repeated_queries(
+            getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+        )
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'db_ms': round(db_ms, 2),
+            'queries': recorder.count,
+            'n_plus_one': repeated,
+        }
+        level = logging.WARNING if repeated else logging.INFO
+        logger.log(level, json.dumps(record), extra={'sql_stats': record})
+
+
+class ReplicaPinMiddleware:
+    """
+    Pins a user's reads to the primary for ``REPLICA_PIN_SECONDS`` after
+    any successful unsafe request they make, so they read their own
+    writes even while replicas lag behind.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def pin(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        if not get_replicas():
+            return
+        # DRF sets ``user`` on the underlying request once it authenticates.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
@@ -0,0 +1,125 @@
+import base64
+import binascii
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def positive_int(integer_string, strict=False, cutoff=None):
+    """``integer_string`` as a positive int no larger than ``cutoff``."""
+    value = int(integer_string)
+    if value < 0 or (value == 0 and strict):
+        raise ValueError()
+    if cutoff:
+        return min(value, cutoff)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a descending ``(ordering_field, id)`` pair.
+
+    Pages are fetched with a range condition on the key rather than an
+    OFFSET, and the result set is never counted, so every page costs the
+    same as the first one.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    ordering_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        reverse, position = self.decode_cursor(request)
+
+        field = self.ordering_field
+        if position is not None:
+            value, pk = position
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'pk__{lookup}': pk})
+            )
+
+        if reverse:
+            queryset = queryset.order_by(field, 'pk')
+        else:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.get_position(self.page[0]))
+
+    def get_position(self, item):
+        return getattr(item, self.ordering_field), item.pk
+
+    def encode_cursor(self, reverse, position):
+        value, pk = position
+        raw = f'{int(reverse)}|{value.isoformat()}|{pk}'
+        cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return False, None
+
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            reverse, value, pk = raw.split('|')
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if value is None or reverse not in ('0', '1'):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse == '1', (value, pk)
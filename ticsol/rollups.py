@@ -0,0 +1,156 @@
+from collections import Counter
+from datetime import date, timedelta
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Upper bound on the number of days a series request may span.
+MAX_SERIES_DAYS = 3660
+
+
+def local_day(value):
+    return timezone.localtime(value).date()
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def parse_series_range(params):
+    """
+    Read ``from``, ``to`` and ``granularity`` from query parameters.
+
+    Returns ``None`` when none of them is given, otherwise a
+    ``(start, end, granularity)`` tuple defaulting to the current year so
+    far by month. Raises ``ValidationError`` for bad values.
+    """
+    if not any(name in params for name in ('from', 'to', 'granularity')):
+        return None
+
+    today = timezone.localdate()
+    errors = {}
+    bounds = {}
+    for name, default in (('from', today.replace(month=1, day=1)),
+                          ('to', today)):
+        value = params.get(name)
+        try:
+            bounds[name] = date.fromisoformat(value) if value else default
+        except ValueError:
+            errors[name] = ['Enter a date in YYYY-MM-DD format.']
+
+    granularity = params.get('granularity') or 'month'
+    if granularity not in GRANULARITIES:
+        errors['granularity'] = [
+            'Choose one of: ' + ', '.join(GRANULARITIES) + '.'
+        ]
+    if errors:
+        raise ValidationError(errors)
+
+    start, end = bounds['from'], bounds['to']
+    if start > end:
+        raise ValidationError({'from': ['Must not be after "to".']})
+    if (end - start).days >= MAX_SERIES_DAYS:
+        raise ValidationError({
+            'from': [f'Ranges are limited to {MAX_SERIES_DAYS} days.']
+        })
+    return start, end, granularity
+
+
+def series_cache_key(key, series_range):
+    if series_range is None:
+        return key
+    start, end, granularity = series_range
+    return f'{key}:{start.isoformat()}:{end.isoformat()}:{granularity}'
+
+
+class DailyRollup(models.Model):
+    """
+    Count of rows created per day for one time series.
+
+    Rows are adjusted by one as records are created or deleted, so reading
+    a range costs one row per day rather than one per record.
+    """
+    day = models.DateField(unique=True)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f'{self.day}: {self.count}'
+
+    @classmethod
+    def add(cls, moment, delta):
+        day = local_day(moment)
+        updated = cls.objects.filter(day=day).update(
+            count=F('count') + delta
+        )
+        if not updated:
+            cls.objects.get_or_create(day=day)
+            cls.objects.filter(day=day).update(count=F('count') + delta)
+
+    @classmethod
+    def series(cls, start, end, granularity):
+        """Return ``[{'period': ..., 'count': ...}]`` for every bucket."""
+        counts = {}
+        rows = cls.objects.filter(
+            day__range=(start, end)
+        ).values_list('day', 'count')
+        for day, count in rows:
+            period = bucket_start(day, granularity)
+            counts[period] = counts.get(period, 0) + count
+
+        series = []
+        period = bucket_start(start, granularity)
+        while period <= end:
+            series.append({
+                'period': period.isoformat(),
+                'count': counts.get(period, 0),
+            })
+            period = next_bucket(period, granularity)
+        return series
+
+    @classmethod
+    def by_month(cls, year):
+        """Counts for the twelve months of ``year``."""
+        series = cls.series(date(year, 1, 1), date(year, 12, 31), 'month')
+        return [bucket['count'] for bucket in series]
+
+    @classmethod
+    def rebuild(cls, field, *querysets):
+        """
+        Rewrite the rollup from ``querysets`` grouped by the day of
+        ``field``. Returns the number of days with records.
+        """
+        totals = Counter()
+        with transaction.atomic():
+            # Locking the rows makes concurrent creates wait for the
+            # rewrite and then apply their increments on top of it.
+            list(cls.objects.select_for_update().values_list('pk'))
+            for queryset in querysets:
+                days = queryset.order_by().annotate(
+                    rollup_day=TruncDate(field)
+                ).values('rollup_day').annotate(total=Count('pk'))
+                for row in days:
+                    totals[row['rollup_day']] += row['total']
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                cls(day=day, count=total) for day, total in totals.items()
+            )
+        return len(totals)
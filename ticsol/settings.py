@@ -1,6 +1,7 @@
 from environs import Env
 from pathlib import Path
 import os
+import sys
 import dj_database_url
 from datetime import timedelta
 
@@ -38,11 +39,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'ticsol.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ticsol.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -81,9 +84,65 @@ WSGI_APPLICATION = 'ticsol.wsgi.application'
 #     }
 # }
 DATABASES = {
-       'default': dj_database_url.parse(env.str('DATABASE_EXTERNAL_URL'))
+       'default': dj_database_url.parse(
+           env.str('DATABASE_EXTERNAL_URL'),
+           conn_max_age=env.int('DATABASE_CONN_MAX_AGE', default=0)
+       )
 }
 
+# Read replicas, as comma-separated database URLs. Safe-method reads of
+# the views using ticsol.views.ReplicaReadMixin are spread over them; a
+# user's reads stay on the primary for REPLICA_PIN_SECONDS after they
+# write. Locally, a copy of an SQLite database can stand in for one.
+DATABASE_REPLICAS = []
+for index, url in enumerate(
+    env.list('DATABASE_REPLICA_URLS', default=[]), start=1
+):
+    alias = f'replica{index}'
+    DATABASES[alias] = dj_database_url.parse(
+        url, conn_max_age=DATABASES['default']['CONN_MAX_AGE']
+    )
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+# Under `manage.py test` without replicas, a mirror of the test database
+# stands in for one, so that replica routing is tested against a second
+# connection. Tests send reads to it by overriding DATABASE_REPLICAS.
+if sys.argv[1:2] == ['test'] and not DATABASE_REPLICAS:
+    DATABASES['replica1'] = {
+        **DATABASES['default'], 'TEST': {'MIRROR': 'default'}
+    }
+
+# Reads only go to replicas with a shared cache (see CACHE_SHARED), where
+# the primary pins of users who just wrote are kept.
+DATABASE_ROUTERS = ['ticsol.db_routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
+
+# CACHE
+# ------------------------------------------------------------------------------
+# Use a shared backend (Redis, Memcached) in production so that cache
+# invalidation reaches every worker process.
+CACHES = {
+    'default': {
+        'BACKEND': env.str(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': env.str('CACHE_LOCATION', default='ticsol'),
+    }
+}
+
+# Whether every worker sees the same cache. Guessed from CACHE_BACKEND
+# (the local-memory backend is not shared) unless set; set it to True when
+# a local-memory cache serves a single process.
+CACHE_SHARED = env.bool('CACHE_SHARED', default=None)
+
+# Upper bound on the lifetime of cached dashboard stats; writes invalidate
+# them long before this in normal operation. Stats are only cached when the
+# cache is shared, since invalidations would not reach other workers.
+STATS_CACHE_TIMEOUT = env.int('STATS_CACHE_TIMEOUT', default=3600)
+
+
 # SECURITY
 # ------------------------------------------------------------------------------
 SESSION_COOKIE_SECURE = True
@@ -139,7 +198,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.StatelessJWTAuthentication',
     ),
 }
 
@@ -152,6 +211,107 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_BLACKLIST": "rest_framework_simplejwt.token_blacklist",
+    "TOKEN_REFRESH_SERIALIZER": (
+        "accounts.serializers.UserStateTokenRefreshSerializer"
+    ),
+}
+
+# Requests are authenticated from token claims. A suspension or role change
+# takes effect in other processes within AUTH_STATE_CACHE_TTL seconds, as
+# long as CACHES points at a backend shared by all workers.
+AUTH_STATE_CACHE_TTL = env.int('AUTH_STATE_CACHE_TTL', default=30)
+AUTH_STATE_CACHE_SIZE = env.int('AUTH_STATE_CACHE_SIZE', default=10000)
+
+# Password hashes for logins run on a bounded worker pool. Logins beyond
+# LOGIN_HASH_WORKERS running plus LOGIN_HASH_QUEUE waiting get a 503.
+LOGIN_HASH_WORKERS = env.int('LOGIN_HASH_WORKERS', default=4)
+LOGIN_HASH_QUEUE = env.int('LOGIN_HASH_QUEUE', default=16)
+LOGIN_HASH_TIMEOUT = env.float('LOGIN_HASH_TIMEOUT', default=10)
+
+# last_login is written behind: at most LAST_LOGIN_FLUSH_INTERVAL seconds
+# (0 writes each login immediately) or LAST_LOGIN_BUFFER_SIZE logins late.
+LAST_LOGIN_FLUSH_INTERVAL = env.int('LAST_LOGIN_FLUSH_INTERVAL', default=60)
+LAST_LOGIN_BUFFER_SIZE = env.int('LAST_LOGIN_BUFFER_SIZE', default=1000)
+
+# Refresh token blacklist checks consult an in-memory Bloom filter first.
+# It picks up tokens blacklisted by other workers through the shared cache,
+# and at least every TOKEN_BLACKLIST_FILTER_MAX_AGE seconds regardless.
+# Without a shared cache (see CACHE_SHARED) the filter is bypassed.
+TOKEN_BLACKLIST_FILTER_MAX_AGE = env.int(
+    'TOKEN_BLACKLIST_FILTER_MAX_AGE', default=30
+)
+TOKEN_BLACKLIST_FILTER_REBUILD = env.int(
+    'TOKEN_BLACKLIST_FILTER_REBUILD', default=3600
+)
+TOKEN_BLACKLIST_FILTER_CAPACITY = env.int(
+    'TOKEN_BLACKLIST_FILTER_CAPACITY', default=10000
+)
+
+
+# TICKETS
+# ------------------------------------------------------------------------------
+# Serve the admin dashboard counts from the maintained counter table. Run
+# `manage.py reconcile_ticket_stats` after turning this back on.
+TICKET_STATS_COUNTERS = env.bool('TICKET_STATS_COUNTERS', default=True)
+
+# Ticket change events streamed by /tickets/events/. The local backend only
+# reaches streams served by the same process; with several workers use
+# tickets.events.CacheEventBackend and a cache shared by all of them.
+TICKET_EVENTS_BACKEND = env.str(
+    'TICKET_EVENTS_BACKEND', default='tickets.events.LocalEventBackend'
+)
+TICKET_EVENTS_BUFFER_SIZE = env.int('TICKET_EVENTS_BUFFER_SIZE', default=1000)
+TICKET_EVENTS_HEARTBEAT = env.int('TICKET_EVENTS_HEARTBEAT', default=15)
+TICKET_EVENTS_POLL_INTERVAL = env.float(
+    'TICKET_EVENTS_POLL_INTERVAL', default=1
+)
+TICKET_EVENTS_TTL = env.int('TICKET_EVENTS_TTL', default=3600)
+
+# Age in days after which `manage.py archive_tickets` moves resolved tickets
+# to the archive table.
+TICKET_ARCHIVE_AFTER_DAYS = env.int('TICKET_ARCHIVE_AFTER_DAYS', default=90)
+
+
+# ASYNC
+# ------------------------------------------------------------------------------
+# Serve the ticket list/detail and dashboard stats endpoints from native
+# async views. Only worth enabling under an ASGI server (see README).
+ASYNC_READ_VIEWS = env.bool('ASYNC_READ_VIEWS', default=False)
+# Threads per process for the concurrent stats queries. Each keeps one
+# connection per database open, whatever DATABASE_CONN_MAX_AGE says.
+ASYNC_QUERY_WORKERS = env.int('ASYNC_QUERY_WORKERS', default=4)
+
+
+# OBSERVABILITY
+# ------------------------------------------------------------------------------
+# Fraction of requests whose SQL is counted and timed (0 disables it).
+# Off by default outside DEBUG; set it where the log lines are collected.
+SQL_INSTRUMENTATION_SAMPLE_RATE = env.float(
+    'SQL_INSTRUMENTATION_SAMPLE_RATE', default=0.05 if DEBUG else 0
+)
+# Send the Server-Timing header of sampled requests to staff users (and to
+# everyone under DEBUG).
+SQL_INSTRUMENTATION_HEADER = env.bool(
+    'SQL_INSTRUMENTATION_HEADER', default=True
+)
+# A SELECT shape repeated this many times in one request is flagged as N+1.
+SQL_N_PLUS_ONE_THRESHOLD = env.int('SQL_N_PLUS_ONE_THRESHOLD', default=5)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'ticsol.sql': {
+            'handlers': ['console'],
+            'level': env.str('SQL_INSTRUMENTATION_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 
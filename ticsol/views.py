@@ -0,0 +1,68 @@
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.views import APIView
+from .cache import cache_is_shared
+from .db_routers import get_replicas, is_pinned, set_replica_reads
+
+
+class ReplicaReadMixin:
+    """
+    Opts a view into replica reads: once a safe-method request has been
+    authenticated and authorised, its ORM reads go to a replica, unless
+    the user wrote recently and is pinned to the primary. Pins are kept in
+    the cache, so without a shared one every read stays on the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and get_replicas() and (
+            cache_is_shared()
+        ):
+            user_id = request.user.pk
+            set_replica_reads(user_id is None or not is_pinned(user_id))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        set_replica_reads(False)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class AsyncAPIView(APIView):
+    """
+    Coroutine counterpart of DRF's ``APIView`` for read endpoints.
+
+    Requests go through the same ``APIView`` steps as the synchronous
+    views: content negotiation, authentication, permissions, throttles and
+    the configured exception handler. Those steps run in a thread and the
+    handler runs as a coroutine, so clients get the same responses.
+
+    Only the ``async_methods`` are served here. Any other method is passed
+    to ``fallback``, normally the synchronous view for the same route.
+    """
+    async_methods = ['get', 'head']
+    fallback = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        if method not in self.async_methods and self.fallback is not None:
+            return await sync_to_async(self.fallback)(
+                request, *args, **kwargs
+            )
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, method, None)
+            if method not in self.async_methods or handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response